@@ -1,9 +1,11 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.utils import secure_filename
 import json
+import time
+import threading
 from datetime import datetime, timedelta
 import logging
 
@@ -21,7 +23,7 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY", os.environ.get("SESSION_SECR
 app.db = db
 
 # Import config - импортируем после создания приложения
-from config import DB_URI, UPLOAD_DIR, RESULTS_DIR, logger, ENV, DEBUG
+from config import DB_URI, UPLOAD_DIR, logger, ENV, DEBUG
 
 # Настройка Flask-приложения для разных сред
 app.config["ENV"] = ENV
@@ -45,61 +47,171 @@ logger.info(f"Flask app initialized: DEBUG={DEBUG}, ENV={ENV}")
 logger.info(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
 # Initialize database
-with app.app_context():
-    import models
-    db.create_all()
-    
-    # Initialize settings if needed
-    from config import DEFAULT_SETTINGS
-    from models import Settings
-    
-    # Проверяем наличие устаревшей настройки result_format и миграция на export_format
-    old_format_setting = Settings.query.filter_by(key='result_format').first()
-    if old_format_setting:
-        # Если есть старая настройка, но нет новой - создаем export_format
-        if not Settings.query.filter_by(key='export_format').first():
-            new_setting = Settings(key='export_format', value=old_format_setting.value)
-            db.session.add(new_setting)
-            logger.info(f"Мигрированы настройки формата экспорта: {old_format_setting.value}")
-    
-    # Инициализируем недостающие настройки по умолчанию
-    for key, value in DEFAULT_SETTINGS.items():
-        if not Settings.query.filter_by(key=key).first():
-            setting = Settings(key=key, value=str(value))
-            db.session.add(setting)
-            logger.info(f"Инициализирована настройка: {key} = {value}")
+from db_migrate import run_migrations
+
+# Процессы извлечения PDF/ZIP (spawn) при запуске `python app.py` заново
+# выполняют этот файл как __mp_main__: БД и планировщик в них не трогаем
+if __name__ != '__mp_main__':
+    with app.app_context():
+        import models
+        db.create_all()
+        run_migrations(db)
+    
+        # Initialize settings if needed
+        from config import DEFAULT_SETTINGS
+        from models import Settings
+    
+        # Проверяем наличие устаревшей настройки result_format и миграция на export_format
+        old_format_setting = Settings.query.filter_by(key='result_format').first()
+        if old_format_setting:
+            # Если есть старая настройка, но нет новой - создаем export_format
+            if not Settings.query.filter_by(key='export_format').first():
+                new_setting = Settings(key='export_format', value=old_format_setting.value)
+                db.session.add(new_setting)
+                logger.info(f"Мигрированы настройки формата экспорта: {old_format_setting.value}")
+    
+        # Инициализируем недостающие настройки по умолчанию
+        for key, value in DEFAULT_SETTINGS.items():
+            if not Settings.query.filter_by(key=key).first():
+                setting = Settings(key=key, value=str(value))
+                db.session.add(setting)
+                logger.info(f"Инициализирована настройка: {key} = {value}")
     
-    db.session.commit()
+        db.session.commit()
 
 # Import utility modules after initializing app and db
-from utils.file_processor import process_file, extract_vk_links
-from utils.vk_parser import parse_vk_post
+from utils.file_processor import (
+    enqueue_file_processing, extract_vk_links, save_upload, save_upload_batch,
+    check_zip_batch, ingest_post_items, delete_files, enqueue_file_cleanup
+)
+from utils.vk_parser import parse_vk_post, get_vk_token
 from utils.scheduler import initialize_scheduler, schedule_post_parsing
+from utils.pagination import keyset_paginate, cached_count
+from utils.query_stats import initialize_query_stats
+from utils.activity import activity_slice, has_unresolved_names, ensure_result_activity, ACTIVITY_KINDS
+from utils.export import (
+    result_info, generate_txt_export, generate_csv_export, cache_stream, cached_export, build_cached_excel_export
+)
 
 # Initialize the scheduler
-scheduler = initialize_scheduler(app)
+if __name__ != '__mp_main__':
+    scheduler = initialize_scheduler(app)
+
+# Счетчик SQL-запросов и времени БД для каждого запроса
+initialize_query_stats(app)
+
+def get_parse_modes():
+    """Список режимов парсинга для форм"""
+    from config import PARSE_MODE_FULL, PARSE_MODE_FAST
+    return [
+        {'value': PARSE_MODE_FULL, 'label': 'Полный (имена пользователей определяются при парсинге)'},
+        {'value': PARSE_MODE_FAST, 'label': 'Быстрый (только id, имена определяются при просмотре и экспорте)'}
+    ]
+
+# Кэш счетчиков главной страницы: значения и момент истечения (time.monotonic)
+dashboard_stats_cache = {'stats': None, 'expires_at': 0}
+dashboard_stats_lock = threading.Lock()
+
+def get_dashboard_stats():
+    """Количество файлов и постов по статусам.
+    
+    Статусы постов считаются одним запросом GROUP BY status, результат
+    кэшируется в процессе на DASHBOARD_STATS_TTL секунд.
+    """
+    from sqlalchemy import func
+    from models import Post, File
+    from config import DASHBOARD_STATS_TTL
+    
+    with dashboard_stats_lock:
+        if dashboard_stats_cache['stats'] is not None and time.monotonic() < dashboard_stats_cache['expires_at']:
+            return dashboard_stats_cache['stats']
+        
+        status_counts = dict(db.session.query(Post.status, func.count()).group_by(Post.status).all())
+        stats = {
+            'total_files': File.query.count(),
+            'pending_posts': status_counts.get('pending', 0),
+            'completed_posts': status_counts.get('completed', 0),
+            'failed_posts': status_counts.get('failed', 0)
+        }
+        dashboard_stats_cache.update(stats=stats, expires_at=time.monotonic() + DASHBOARD_STATS_TTL)
+        return stats
+
+# Постраничный вывод списков по курсору (after/before) вместо номера страницы
+LISTING_PER_PAGE = 10
+
+def archive_page():
+    """Страница архива файлов, новые сначала"""
+    from models import File
+    
+    return keyset_paginate(
+        File.query, File.uploaded_at, File.id, LISTING_PER_PAGE,
+        after=request.args.get('after'), before=request.args.get('before'),
+        total=cached_count('archive', File.query)
+    )
+
+def result_list_options():
+    """Опции загрузки результатов для списков: пост одним запросом, без JSON-данных активности"""
+    from sqlalchemy.orm import joinedload, load_only
+    from models import ParseResult
+    
+    return (
+        joinedload(ParseResult.post),
+        load_only(ParseResult.post_id, ParseResult.likes_count, ParseResult.comments_count,
+                  ParseResult.reposts_count, ParseResult.created_at)
+    )
+
+def results_page():
+    """Страница результатов парсинга, новые сначала"""
+    from models import ParseResult, Post
+    
+    query = ParseResult.query.join(Post)
+    return keyset_paginate(
+        query.options(*result_list_options()), ParseResult.created_at, ParseResult.id, LISTING_PER_PAGE,
+        after=request.args.get('after'), before=request.args.get('before'),
+        total=cached_count('results', query)
+    )
+
+def scheduled_page(now_moscow):
+    """Страница запланированных постов: ожидающие, время парсинга которых еще не наступило"""
+    from sqlalchemy.orm import joinedload
+    from models import Post
+    
+    # Убираем tzinfo для сравнения с полями в БД (наивное время)
+    query = Post.query.filter(
+        Post.status == 'pending',
+        Post.parse_time > now_moscow.replace(tzinfo=None)
+    )
+    return keyset_paginate(
+        query.options(joinedload(Post.file)), Post.parse_time, Post.id, LISTING_PER_PAGE,
+        after=request.args.get('after'), before=request.args.get('before'),
+        descending=False, total=cached_count('scheduled', query)
+    )
+
+def page_json(page, items):
+    """JSON-ответ для страницы списка с курсорами соседних страниц"""
+    return jsonify({
+        'items': items,
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+        'total': page.total
+    })
 
 # Routes
 @app.route('/')
 def index():
     """Main dashboard page"""
-    from models import Post, File, ParseResult
+    from models import File, ParseResult
     
     # Get quick stats
-    total_files = File.query.count()
-    pending_posts = Post.query.filter_by(status='pending').count()
-    completed_posts = Post.query.filter_by(status='completed').count()
-    failed_posts = Post.query.filter_by(status='failed').count()
+    stats = get_dashboard_stats()
     
     # Get recent activities
     recent_uploads = File.query.order_by(File.uploaded_at.desc()).limit(5).all()
-    recent_results = ParseResult.query.order_by(ParseResult.created_at.desc()).limit(5).all()
+    recent_results = ParseResult.query.options(*result_list_options()) \
+        .order_by(ParseResult.created_at.desc()).limit(5).all()
     
     return render_template('index.html', 
-                          total_files=total_files,
-                          pending_posts=pending_posts,
-                          completed_posts=completed_posts,
-                          failed_posts=failed_posts,
+                          **stats,
                           recent_uploads=recent_uploads,
                           recent_results=recent_results)
 
@@ -108,6 +220,8 @@ def upload():
     """Страница загрузки файлов"""
     from models import File
     from config import PARSE_OPTION_STANDARD, PARSE_OPTION_NOW, PARSE_OPTION_5MIN, PARSE_OPTION_30MIN, PARSE_OPTION_1HOUR
+    from config import DUPLICATE_ACTION_LINK, DUPLICATE_ACTION_RESCHEDULE
+    from config import PARSE_MODE_FULL, PARSE_MODE_FAST
     
     if request.method == 'POST':
         # Проверка наличия файла в запросе
@@ -115,31 +229,61 @@ def upload():
             flash('Отсутствует часть с файлом', 'danger')
             return redirect(request.url)
         
-        file = request.files['file']
+        # Несколько файлов или ZIP-архив обрабатываются одним пакетом
+        files = [f for f in request.files.getlist('file') if f.filename]
         
         # Проверка выбора файла
-        if file.filename == '':
+        if not files:
             flash('Не выбран файл', 'danger')
             return redirect(request.url)
         
         # Получаем опцию парсинга из формы
         parse_option = request.form.get('parse_option', PARSE_OPTION_STANDARD)
+        # Пустое значение - использовать глобальный режим из настроек
+        parse_mode = request.form.get('parse_mode') or None
+        if parse_mode not in (None, PARSE_MODE_FULL, PARSE_MODE_FAST):
+            flash(f'Неизвестный режим парсинга: {parse_mode}', 'danger')
+            return redirect(request.url)
+        # Что делать, если файл с таким содержимым уже загружался
+        duplicate_action = request.form.get('duplicate_action', DUPLICATE_ACTION_LINK)
+        if duplicate_action not in (DUPLICATE_ACTION_LINK, DUPLICATE_ACTION_RESCHEDULE):
+            flash(f'Неизвестное действие для повторной загрузки: {duplicate_action}', 'danger')
+            return redirect(request.url)
         
-        # Проверка расширения файла
-        allowed_extensions = {'html', 'txt', 'pdf'}
-        file_ext = file.filename.rsplit('.', 1)[-1].lower()
+        # Проверка расширения файла; ZIP-архив загружается только отдельно
+        allowed_extensions = {'html', 'txt', 'pdf', 'zip'}
+        extensions = [f.filename.rsplit('.', 1)[-1].lower() for f in files]
         
-        if file_ext not in allowed_extensions:
-            flash(f'Разрешены только файлы типа {", ".join(allowed_extensions)}', 'danger')
+        if any(ext not in allowed_extensions for ext in extensions) or (len(files) > 1 and 'zip' in extensions):
+            flash(f'Разрешены только файлы типа {", ".join(sorted(allowed_extensions))} (ZIP-архив - отдельно)', 'danger')
             return redirect(request.url)
         
         try:
-            # Сохраняем файл
-            filename = secure_filename(file.filename)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_filename = f"{timestamp}_{filename}"
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-            file.save(file_path)
+            if len(files) == 1:
+                # Сохраняем файл
+                filename = secure_filename(files[0].filename)
+                file_ext = extensions[0]
+                file_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{filename}")
+                # Хеш содержимого считается при записи на диск, без повторного чтения
+                content_hash = save_upload(files[0].stream, file_path)
+            else:
+                # Файлы пакета сохраняются в один ZIP-архив
+                filename = f"batch_{len(files)}_files.zip"
+                file_ext = 'zip'
+                file_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{filename}")
+                content_hash = save_upload_batch(
+                    [(os.path.basename(f.filename), f.stream) for f in files], file_path
+                )
+            
+            if file_ext == 'zip':
+                # Архив с превышением лимитов пакета (ZIP-бомба) не ставится в очередь
+                try:
+                    check_zip_batch(file_path)
+                except ValueError as e:
+                    os.remove(file_path)
+                    flash(f'Архив отклонен: {str(e)}', 'danger')
+                    return redirect(request.url)
             
             # Создаем запись в БД
             db_file = File(
@@ -147,15 +291,38 @@ def upload():
                 file_path=file_path,
                 file_type=file_ext,
                 parse_option=parse_option,
-                status='processing'
+                parse_mode=parse_mode,
+                status='processing',
+                content_hash=content_hash
             )
+            
+            original = File.query.filter_by(
+                content_hash=content_hash, status='processed', duplicate_of_id=None
+            ).order_by(File.uploaded_at.desc()).first()
+            
+            if original and duplicate_action == DUPLICATE_ACTION_LINK:
+                # Повторная загрузка: показываем посты ранее загруженного файла
+                db_file.status = 'processed'
+                db_file.duplicate_of_id = original.id
+                db_file.links_found = original.links_found
+                db_file.links_resolved = original.links_resolved
+                db_file.posts_created = 0
+                db.session.add(db_file)
+                db.session.commit()
+                
+                flash(f'Файл уже загружался ранее ({original.filename}) и привязан к существующим постам', 'info')
+                return redirect(url_for('file_detail', file_id=db_file.id))
+            
             db.session.add(db_file)
             db.session.commit()
             
-            # Обрабатываем файл в фоне
-            process_file(db_file.id, app)
+            # Обрабатываем файл в фоне; при повторной загрузке ссылки и время берутся из кэша извлечения
+            enqueue_file_processing(db_file.id, app)
             
-            flash(f'Файл успешно загружен и начата обработка', 'success')
+            if original:
+                flash(f'Файл уже загружался ранее ({original.filename}), посты будут запланированы заново', 'success')
+            else:
+                flash(f'Файл успешно загружен и поставлен в очередь на обработку', 'success')
             return redirect(url_for('archive'))
             
         except Exception as e:
@@ -172,62 +339,41 @@ def upload():
         {'value': PARSE_OPTION_1HOUR, 'label': 'За 1 час до истечения 24 часов'}
     ]
     
-    return render_template('upload.html', parse_options=parse_options)
+    return render_template('upload.html', parse_options=parse_options, parse_modes=get_parse_modes())
 
 @app.route('/archive')
 def archive():
     """Страница архива файлов"""
-    from models import File
-    
-    # Получаем все файлы с пагинацией
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
-    files = File.query.order_by(File.uploaded_at.desc()).paginate(page=page, per_page=per_page)
-    
-    return render_template('archive.html', files=files)
+    return render_template('archive.html', files=archive_page())
 
 @app.route('/archive/file/<int:file_id>')
 def file_detail(file_id):
     """Страница детальной информации о файле с извлеченными постами"""
-    from models import File, Post
+    from sqlalchemy.orm import selectinload
+    from models import File, Post, ParseResult
     
     file = File.query.get_or_404(file_id)
-    posts = Post.query.filter_by(file_id=file_id).all()
+    # Повторная загрузка показывает посты исходного файла
+    original = File.query.get(file.duplicate_of_id) if file.duplicate_of_id else None
+    # Для ссылок на результаты нужны только их id, одним запросом на все посты
+    posts = Post.query.filter_by(file_id=original.id if original else file_id) \
+        .options(selectinload(Post.results).load_only(ParseResult.id)).all()
     
-    return render_template('file_detail.html', file=file, posts=posts)
+    return render_template('file_detail.html', file=file, posts=posts, original=original)
 
 @app.route('/archive/file/<int:file_id>/delete', methods=['POST'])
 def delete_file(file_id):
     """Удаление файла и связанных постов"""
-    from models import File, Post
+    from models import File
     
-    file = File.query.get(file_id)
-    if not file:
+    if not File.query.get(file_id):
         flash('Файл не найден', 'danger')
         return redirect(url_for('archive'))
     
     try:
-        # Удаляем связанные посты
-        posts = Post.query.filter_by(file_id=file_id).all()
-        for post in posts:
-            # Удаляем результаты постов, если есть
-            results = post.results
-            for result in results:
-                db.session.delete(result)
-            
-            db.session.delete(post)
-        
-        # Удаляем физический файл, если существует
-        if os.path.exists(file.file_path):
-            try:
-                os.remove(file.file_path)
-            except OSError as e:
-                logger.warning(f"Не удалось удалить физический файл: {str(e)}")
-        
-        # Удаляем запись о файле
-        db.session.delete(file)
-        db.session.commit()
+        # Посты и результаты удаляются пакетами, файлы с диска - в фоне
+        file_paths, result_ids = delete_files(db, [file_id])
+        enqueue_file_cleanup(file_paths, result_ids)
         
         flash('Файл и связанные данные успешно удалены', 'success')
     except Exception as e:
@@ -237,30 +383,51 @@ def delete_file(file_id):
     
     return redirect(url_for('archive'))
 
+@app.route('/archive/files/delete', methods=['POST'])
+def delete_selected_files():
+    """Удаление нескольких выбранных в архиве файлов"""
+    file_ids = request.form.getlist('file_ids', type=int)
+    if not file_ids:
+        flash('Не выбраны файлы для удаления', 'warning')
+        return redirect(url_for('archive'))
+    
+    try:
+        file_paths, result_ids = delete_files(db, file_ids)
+        enqueue_file_cleanup(file_paths, result_ids)
+        
+        flash(f'Удалено файлов: {len(file_paths)}', 'success')
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Ошибка удаления файлов: {str(e)}")
+        flash(f'Ошибка удаления файлов: {str(e)}', 'danger')
+    
+    return redirect(url_for('archive'))
+
 @app.route('/results')
 def results():
     """Страница результатов парсинга"""
-    from models import ParseResult, Post
-    
-    # Получаем все результаты с пагинацией
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
-    results = ParseResult.query.join(Post).order_by(ParseResult.created_at.desc()).paginate(page=page, per_page=per_page)
-    
-    return render_template('results.html', results=results)
+    return render_template('results.html', results=results_page())
 
 @app.route('/results/<int:result_id>')
 def result_detail(result_id):
     """Детальный просмотр результата парсинга"""
-    from models import ParseResult, Settings
-    
-    result = ParseResult.query.get_or_404(result_id)
-    
-    # Подготавливаем данные для отображения
-    likes_data = json.loads(result.likes_data) if result.likes_data else []
-    comments_data = json.loads(result.comments_data) if result.comments_data else []
-    reposts_data = json.loads(result.reposts_data) if result.reposts_data else []
+    from sqlalchemy.orm import joinedload
+    from models import ParseResult, Post, Settings
+    
+    result = ParseResult.query.options(
+        joinedload(ParseResult.post).joinedload(Post.file)
+    ).get_or_404(result_id)
+    
+    # Первые срезы списков активности, остальное страница догружает при прокрутке
+    # (имена для быстрого режима определяются здесь)
+    ensure_result_activity(db, result_id)
+    token = get_vk_token(app)
+    likes_data, likes_next = activity_slice(db, result_id, 'likes', token=token)
+    comments_data, comments_next = activity_slice(db, result_id, 'comments', token=token)
+    reposts_data, reposts_next = activity_slice(db, result_id, 'reposts', token=token)
+    # Имена остальных пользователей быстрого режима появятся при прокрутке или экспорте,
+    # до этого поиск по имени их не находит
+    names_pending = has_unresolved_names(db, result_id)
     
     # Получаем текущий формат экспорта
     export_format_setting = Settings.query.filter_by(key='export_format').first()
@@ -280,15 +447,29 @@ def result_detail(result_id):
                           likes_data=likes_data,
                           comments_data=comments_data,
                           reposts_data=reposts_data,
+                          likes_next=likes_next,
+                          comments_next=comments_next,
+                          reposts_next=reposts_next,
+                          names_pending=names_pending,
                           export_format=export_format_label)
 
 @app.route('/results/<int:result_id>/export')
 def export_result(result_id):
-    """Экспорт результата парсинга в выбранном формате (TXT, CSV или Excel)"""
+    """Экспорт результата парсинга в выбранном формате (TXT, CSV или Excel)
+    
+    ETag (хэш содержимого) есть только у экспортов, готовых до ответа: взятых
+    из кэша и Excel. Первая загрузка TXT/CSV идет потоком без ETag, так как
+    хэш известен только в конце; она же сохраняет экспорт в кэш, и следующие
+    загрузки получают ETag и 304 на If-None-Match.
+    """
+    from sqlalchemy.orm import joinedload
     from models import ParseResult, Settings
-    import pandas as pd
     
-    result = ParseResult.query.get_or_404(result_id)
+    result = ParseResult.query.options(joinedload(ParseResult.post)).get_or_404(result_id)
+    # Поток экспорта читается уже после возврата из view, когда сессия закрыта:
+    # генераторам передаются готовые значения, а не объект результата
+    info = result_info(result)
+    ensure_result_activity(db, result_id)
     
     # Получаем предпочтительный формат из настроек
     export_format_setting = Settings.query.filter_by(key='export_format').first()
@@ -299,157 +480,47 @@ def export_result(result_id):
     from config import get_now_moscow
     timestamp = get_now_moscow().strftime('%Y%m%d_%H%M%S')
     
-    if export_format == 'txt':
-        # TXT формат (исходный вариант)
-        export_filename = f"result_{result_id}_{timestamp}.txt"
-        export_path = os.path.join(RESULTS_DIR, export_filename)
-        
-        # Генерируем содержимое экспорта в текстовом формате
-        with open(export_path, 'w', encoding='utf-8') as f:
-            f.write(f"Результаты парсинга поста ВКонтакте\n")
-            f.write(f"Ссылка на пост: {result.post.link}\n")
-            f.write(f"Время парсинга: {result.created_at_moscow.strftime('%d.%m.%Y %H:%M:%S')} (МСК)\n\n")
-            
-            # Лайки
-            f.write(f"ЛАЙКИ ({result.likes_count}):\n")
-            if result.likes_data:
-                likes = json.loads(result.likes_data)
-                for i, user in enumerate(likes, 1):
-                    f.write(f"{i}. {user.get('name', 'Неизвестно')} - https://vk.com/id{user.get('id', '')}\n")
-            f.write("\n")
-            
-            # Комментарии
-            f.write(f"КОММЕНТАРИИ ({result.comments_count}):\n")
-            if result.comments_data:
-                comments = json.loads(result.comments_data)
-                for i, comment in enumerate(comments, 1):
-                    f.write(f"{i}. {comment.get('name', 'Неизвестно')} - https://vk.com/id{comment.get('id', '')}\n")
-                    if 'text' in comment and comment['text']:
-                        f.write(f"   Комментарий: {comment['text']}\n")
-            f.write("\n")
-            
-            # Репосты
-            f.write(f"РЕПОСТЫ ({result.reposts_count}):\n")
-            if result.reposts_data:
-                reposts = json.loads(result.reposts_data)
-                for i, user in enumerate(reposts, 1):
-                    f.write(f"{i}. {user.get('name', 'Неизвестно')} - https://vk.com/id{user.get('id', '')}\n")
-        
-    elif export_format == 'csv':
-        # CSV формат
-        export_filename = f"result_{result_id}_{timestamp}.csv"
-        export_path = os.path.join(RESULTS_DIR, export_filename)
-        
-        # Подготавливаем данные для CSV
-        data = {
-            'Тип': [],
-            'ID пользователя': [],
-            'Имя пользователя': [],
-            'Профиль ВК': [],
-            'Комментарий': []
-        }
-        
-        # Лайки
-        if result.likes_data:
-            likes = json.loads(result.likes_data)
-            for user in likes:
-                data['Тип'].append('Лайк')
-                data['ID пользователя'].append(user.get('id', ''))
-                data['Имя пользователя'].append(user.get('name', 'Неизвестно'))
-                data['Профиль ВК'].append(f"https://vk.com/id{user.get('id', '')}")
-                data['Комментарий'].append('')
-        
-        # Комментарии
-        if result.comments_data:
-            comments = json.loads(result.comments_data)
-            for comment in comments:
-                data['Тип'].append('Комментарий')
-                data['ID пользователя'].append(comment.get('id', ''))
-                data['Имя пользователя'].append(comment.get('name', 'Неизвестно'))
-                data['Профиль ВК'].append(f"https://vk.com/id{comment.get('id', '')}")
-                data['Комментарий'].append(comment.get('text', ''))
-        
-        # Репосты
-        if result.reposts_data:
-            reposts = json.loads(result.reposts_data)
-            for user in reposts:
-                data['Тип'].append('Репост')
-                data['ID пользователя'].append(user.get('id', ''))
-                data['Имя пользователя'].append(user.get('name', 'Неизвестно'))
-                data['Профиль ВК'].append(f"https://vk.com/id{user.get('id', '')}")
-                data['Комментарий'].append('')
-        
-        # Создаем DataFrame и сохраняем в CSV
-        df = pd.DataFrame(data)
-        df.to_csv(export_path, index=False, encoding='utf-8-sig')  # utf-8-sig для корректного отображения в Excel
-        
-    elif export_format == 'excel':
-        # Excel формат
-        export_filename = f"result_{result_id}_{timestamp}.xlsx"
-        export_path = os.path.join(RESULTS_DIR, export_filename)
-        
-        # Создаем Excel-файл с несколькими листами
-        with pd.ExcelWriter(export_path, engine='xlsxwriter') as writer:
-            # Лист с основной информацией
-            info_data = {
-                'Параметр': ['Ссылка на пост', 'Время парсинга', 'Количество лайков', 'Количество комментариев', 'Количество репостов'],
-                'Значение': [
-                    result.post.link,
-                    f"{result.created_at_moscow.strftime('%d.%m.%Y %H:%M:%S')} (МСК)",
-                    result.likes_count,
-                    result.comments_count,
-                    result.reposts_count
-                ]
-            }
-            pd.DataFrame(info_data).to_excel(writer, sheet_name='Информация', index=False)
-            
-            # Лист с лайками
-            if result.likes_data:
-                likes = json.loads(result.likes_data)
-                likes_data = {
-                    'ID пользователя': [user.get('id', '') for user in likes],
-                    'Имя пользователя': [user.get('name', 'Неизвестно') for user in likes],
-                    'Профиль ВК': [f"https://vk.com/id{user.get('id', '')}" for user in likes]
-                }
-                pd.DataFrame(likes_data).to_excel(writer, sheet_name='Лайки', index=False)
-            
-            # Лист с комментариями
-            if result.comments_data:
-                comments = json.loads(result.comments_data)
-                comments_data = {
-                    'ID пользователя': [comment.get('id', '') for comment in comments],
-                    'Имя пользователя': [comment.get('name', 'Неизвестно') for comment in comments],
-                    'Комментарий': [comment.get('text', '') for comment in comments],
-                    'Профиль ВК': [f"https://vk.com/id{comment.get('id', '')}" for comment in comments]
-                }
-                pd.DataFrame(comments_data).to_excel(writer, sheet_name='Комментарии', index=False)
-            
-            # Лист с репостами
-            if result.reposts_data:
-                reposts = json.loads(result.reposts_data)
-                reposts_data = {
-                    'ID пользователя': [user.get('id', '') for user in reposts],
-                    'Имя пользователя': [user.get('name', 'Неизвестно') for user in reposts],
-                    'Профиль ВК': [f"https://vk.com/id{user.get('id', '')}" for user in reposts]
-                }
-                pd.DataFrame(reposts_data).to_excel(writer, sheet_name='Репосты', index=False)
-    
-    else:
+    if export_format not in ('csv', 'excel'):
         # Если формат неизвестен, используем TXT по умолчанию
-        export_filename = f"result_{result_id}_{timestamp}.txt"
-        export_path = os.path.join(RESULTS_DIR, export_filename)
-        with open(export_path, 'w', encoding='utf-8') as f:
-            f.write(f"Результаты парсинга поста ВКонтакте\n")
-            f.write(f"Ссылка на пост: {result.post.link}\n")
-            f.write(f"Время парсинга: {result.created_at_moscow.strftime('%d.%m.%Y %H:%M:%S')} (МСК)\n")
+        export_format = 'txt'
+    extension = 'xlsx' if export_format == 'excel' else export_format
+    export_filename = f"result_{result_id}_{timestamp}.{extension}"
+    
+    # Результат не меняется после записи, поэтому готовый экспорт берется из кэша;
+    # при совпадении If-None-Match с ETag (хэш содержимого) отдается 304
+    cached = cached_export(result_id, export_format)
+    if cached:
+        path, content_hash = cached
+        return send_file(path, as_attachment=True, download_name=export_filename, etag=content_hash)
+    
+    # Имена для быстрого режима определяются при экспорте
+    token = get_vk_token(app)
+    
+    if export_format == 'excel':
+        # Excel формат (xlsx - zip-архив, поэтому пишется в файл, а не потоком)
+        path, content_hash = build_cached_excel_export(db, info, token)
+        return send_file(path, as_attachment=True, download_name=export_filename, etag=content_hash)
+    
+    # TXT и CSV отдаются потоком по мере чтения активности и одновременно сохраняются в кэш
+    # (без ETag: хэш содержимого становится известен только после отправки)
+    if export_format == 'csv':
+        generate, mimetype = generate_csv_export, 'text/csv'
+    else:
+        generate, mimetype = generate_txt_export, 'text/plain'
     
-    # Возвращаем файл для скачивания
-    return send_file(export_path, as_attachment=True, download_name=export_filename)
+    chunks = cache_stream(db, generate(db, info, token), result_id, export_format, extension)
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={export_filename}'})
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     """Страница настроек"""
     from models import Settings
+    from config import PARSE_MODE_FULL, PARSE_MODE_FAST
+    
+    if request.method == 'POST' and request.form.get('parse_mode', PARSE_MODE_FULL) not in (PARSE_MODE_FULL, PARSE_MODE_FAST):
+        flash(f'Неизвестный режим парсинга: {request.form["parse_mode"]}', 'danger')
+        return redirect(url_for('settings'))
     
     if request.method == 'POST':
         # Обновляем настройки
@@ -457,6 +528,8 @@ def settings():
             vk_token = request.form.get('vk_token', '')
             parse_option = request.form.get('default_parse_option', 'standard')
             export_format = request.form.get('export_format', 'txt')
+            parse_mode = request.form.get('parse_mode', PARSE_MODE_FULL)
+            comment_threads = 'on' if request.form.get('comment_threads') else 'off'
             
             # Обновляем настройки в базе данных
             vk_token_setting = Settings.query.filter_by(key='vk_token').first()
@@ -473,6 +546,22 @@ def settings():
                 export_format_setting = Settings(key='export_format', value=export_format)
                 db.session.add(export_format_setting)
             
+            # Обновляем или создаем настройку режима парсинга
+            parse_mode_setting = Settings.query.filter_by(key='parse_mode').first()
+            if parse_mode_setting:
+                parse_mode_setting.value = parse_mode
+            else:
+                parse_mode_setting = Settings(key='parse_mode', value=parse_mode)
+                db.session.add(parse_mode_setting)
+            
+            # Обновляем или создаем настройку сбора веток комментариев
+            comment_threads_setting = Settings.query.filter_by(key='comment_threads').first()
+            if comment_threads_setting:
+                comment_threads_setting.value = comment_threads
+            else:
+                comment_threads_setting = Settings(key='comment_threads', value=comment_threads)
+                db.session.add(comment_threads_setting)
+            
             db.session.commit()
             
             flash('Настройки успешно обновлены', 'success')
@@ -495,34 +584,20 @@ def settings():
         {'value': PARSE_OPTION_1HOUR, 'label': 'За 1 час до истечения 24 часов'}
     ]
     
-    return render_template('settings.html', settings=settings_dict, parse_options=parse_options)
+    return render_template('settings.html', settings=settings_dict, parse_options=parse_options,
+                           parse_modes=get_parse_modes())
 
 @app.route('/scheduled')
 def scheduled():
     """Страница запланированных постов для парсинга"""
-    from models import Post
     from config import get_now_moscow
     
-    # Получаем все запланированные посты с пагинацией
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
     # Получаем текущее московское время
     now_moscow = get_now_moscow()
     
-    # Убираем tzinfo для сравнения с полями в БД (наивное время)
-    now_moscow_naive = now_moscow.replace(tzinfo=None)
-    
-    # Получаем список задач для парсинга, которые ещё не обработаны и 
-    # время парсинга которых ещё не наступило
-    pending_posts = Post.query.filter(
-        Post.status == 'pending',
-        Post.parse_time > now_moscow_naive
-    ).order_by(Post.parse_time).paginate(page=page, per_page=per_page)
-    
     # Возвращаем в шаблон текущее московское время С часовым поясом
     # для правильного отображения в UI
-    return render_template('scheduled.html', posts=pending_posts, current_time=now_moscow)
+    return render_template('scheduled.html', posts=scheduled_page(now_moscow), current_time=now_moscow)
 
 @app.route('/scheduled/<int:post_id>/cancel', methods=['POST'])
 def cancel_scheduled(post_id):
@@ -551,13 +626,232 @@ def api_process_file(file_id):
     file = File.query.get_or_404(file_id)
     
     try:
-        # Обрабатываем файл
-        process_file(file_id, app)
-        return jsonify({'status': 'success', 'message': 'Файл успешно обработан'})
+        # Ставим файл в очередь фоновой обработки
+        file.status = 'processing'
+        db.session.commit()
+        enqueue_file_processing(file_id, app)
+        return jsonify({'status': 'success', 'message': 'Файл поставлен в очередь на обработку'}), 202
     except Exception as e:
         logger.error(f"Ошибка обработки файла: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def get_file_status(file_id):
+    """Читает статус и прогресс обработки файла одним запросом по столбцам"""
+    from models import File
+    
+    row = db.session.query(
+        File.status, File.links_found, File.links_resolved, File.posts_created, File.error_message
+    ).filter(File.id == file_id).first()
+    if row is None:
+        return None
+    
+    return {
+        'id': file_id,
+        'status': row.status,
+        'links_found': row.links_found,
+        'links_resolved': row.links_resolved,
+        'posts_created': row.posts_created,
+        'error': row.error_message
+    }
+
+@app.route('/api/file-status/<int:file_id>')
+def api_file_status(file_id):
+    """API endpoint для получения статуса и прогресса обработки файла"""
+    status = get_file_status(file_id)
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'Файл не найден'}), 404
+    return jsonify(status)
+
+@app.route('/api/file-status/<int:file_id>/stream')
+def api_file_status_stream(file_id):
+    """Server-sent events с прогрессом обработки файла (альтернатива опросу)
+    
+    Поток занимает рабочий процесс, поэтому длится не дольше
+    FILE_STATUS_STREAM_MAX_SECONDS. Затем приходит событие poll с адресом и
+    интервалом опроса /api/file-status, на который клиент должен перейти.
+    """
+    from config import (
+        FILE_STATUS_STREAM_MAX_SECONDS, FILE_STATUS_STREAM_HEARTBEAT_SECONDS, FILE_STATUS_POLL_SECONDS
+    )
+    poll = json.dumps({'url': url_for('api_file_status', file_id=file_id), 'interval': FILE_STATUS_POLL_SECONDS})
+    
+    def generate():
+        last_payload = None
+        started = last_sent = time.monotonic()
+        while True:
+            status = get_file_status(file_id)
+            # Завершаем транзакцию чтения, чтобы следующий опрос видел новые данные
+            db.session.rollback()
+            if status is None:
+                yield "event: error\ndata: {}\n\n"
+                return
+            
+            now = time.monotonic()
+            payload = json.dumps(status, ensure_ascii=False)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload, last_sent = payload, now
+            elif now - last_sent >= FILE_STATUS_STREAM_HEARTBEAT_SECONDS:
+                # Комментарий SSE: клиент его не видит, а запись в закрытое соединение завершит поток
+                yield ": ping\n\n"
+                last_sent = now
+            
+            if status['status'] != 'processing':
+                return
+            if now - started >= FILE_STATUS_STREAM_MAX_SECONDS:
+                yield f"event: poll\ndata: {poll}\n\n"
+                return
+            time.sleep(1)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/files')
+def api_files():
+    """API endpoint для архива файлов (курсоры next/prev как в /archive)"""
+    page = archive_page()
+    return page_json(page, [{
+        'id': file.id,
+        'filename': file.filename,
+        'file_type': file.file_type,
+        'status': file.status,
+        'parse_option': file.parse_option,
+        'uploaded_at': file.uploaded_at_moscow.isoformat(),
+        'links_found': file.links_found,
+        'posts_created': file.posts_created
+    } for file in page.items])
+
+@app.route('/api/results')
+def api_results():
+    """API endpoint для результатов парсинга (курсоры next/prev как в /results)"""
+    page = results_page()
+    return page_json(page, [{
+        'id': result.id,
+        'post_id': result.post_id,
+        'link': result.post.link,
+        'likes_count': result.likes_count,
+        'comments_count': result.comments_count,
+        'reposts_count': result.reposts_count,
+        'created_at': result.created_at_moscow.isoformat()
+    } for result in page.items])
+
+@app.route('/api/scheduled')
+def api_scheduled():
+    """API endpoint для запланированных постов (курсоры next/prev как в /scheduled)"""
+    from config import get_now_moscow
+    
+    page = scheduled_page(get_now_moscow())
+    return page_json(page, [{
+        'id': post.id,
+        'link': post.link,
+        'file_id': post.file_id,
+        'publish_time': post.publish_time_moscow.isoformat(),
+        'parse_time': post.parse_time_moscow.isoformat()
+    } for post in page.items])
+
+@app.route('/api/results/<int:result_id>/activity/<kind>')
+def api_result_activity(result_id, kind):
+    """API endpoint для среза списка лайков, комментариев или репостов результата
+    
+    Параметры: after - позиция, после которой продолжить (next из предыдущего ответа),
+    limit - размер среза, q - поиск по имени или тексту комментария.
+    """
+    from models import ParseResult
+    from config import ACTIVITY_PAGE_SIZE, ACTIVITY_PAGE_MAX
+    
+    if kind not in ACTIVITY_KINDS or not db.session.query(ParseResult.id).filter_by(id=result_id).first():
+        return jsonify({'status': 'error', 'message': 'Результат не найден'}), 404
+    
+    after = request.args.get('after', 0, type=int)
+    limit = min(max(request.args.get('limit', ACTIVITY_PAGE_SIZE, type=int), 1), ACTIVITY_PAGE_MAX)
+    search = request.args.get('q', '').strip() or None
+    
+    items, next_after = activity_slice(db, result_id, kind, after, limit, search, get_vk_token(app))
+    return jsonify({'items': items, 'next': next_after})
+
+@app.route('/api/posts/bulk', methods=['POST'])
+def api_posts_bulk():
+    """API endpoint для массового добавления постов по ссылкам, без загрузки файла.
+    
+    Принимает JSON - список ссылок или объектов {"link", "publish_time", "parse_option"},
+    либо {"posts": [...], "parse_option": ...} - или NDJSON (application/x-ndjson,
+    по объекту или ссылке на строку). NDJSON читается и отдается построчно,
+    поэтому память не зависит от количества ссылок; JSON-тело разбирается
+    целиком и принимается размером не больше BULK_JSON_MAX_BYTES.
+    Оба варианта отвечают 201.
+    """
+    from config import PARSE_OPTION_STANDARD, PARSE_OPTIONS, BULK_JSON_MAX_BYTES
+    parse_option = request.args.get('parse_option', PARSE_OPTION_STANDARD)
+    
+    if request.mimetype == 'application/x-ndjson':
+        if parse_option not in PARSE_OPTIONS:
+            return jsonify({'status': 'error', 'message': f'Неизвестная опция парсинга: {parse_option}'}), 400
+        
+        def lines():
+            # Читаем блоками: построчное чтение request.stream идет по одному байту
+            tail = b''
+            while True:
+                chunk = request.stream.read(65536)
+                if not chunk:
+                    break
+                *complete, tail = (tail + chunk).split(b'\n')
+                yield from complete
+            yield tail
+        
+        def items():
+            for line in lines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Строка без кавычек - просто ссылка
+                    yield line.decode('utf-8', errors='replace')
+        
+        def generate():
+            try:
+                for result in ingest_post_items(items(), app, parse_option):
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+            except Exception as e:
+                # Статус уже отправлен: об ошибке сообщает последняя строка ответа,
+                # строки до нее относятся к уже сохраненным постам
+                db.session.rollback()
+                logger.error(f"Ошибка массового добавления постов: {str(e)}")
+                yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(generate()), status=201, mimetype='application/x-ndjson')
+    
+    if request.content_length is None or request.content_length > BULK_JSON_MAX_BYTES:
+        return jsonify({
+            'status': 'error',
+            'message': f'JSON-тело должно быть не больше {BULK_JSON_MAX_BYTES} байт и иметь Content-Length; '
+                       f'для больших списков используйте NDJSON (application/x-ndjson)'
+        }), 413
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        parse_option = data.get('parse_option', parse_option)
+        data = data.get('posts')
+    if not isinstance(data, list):
+        return jsonify({'status': 'error', 'message': 'Ожидается список ссылок или {"posts": [...]}'}), 400
+    if parse_option not in PARSE_OPTIONS:
+        return jsonify({'status': 'error', 'message': f'Неизвестная опция парсинга: {parse_option}'}), 400
+    
+    try:
+        results = list(ingest_post_items(data, app, parse_option))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Ошибка массового добавления постов: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    return jsonify({
+        'status': 'success',
+        'created': len({result['id'] for result in results if 'id' in result}),
+        'errors': sum(1 for result in results if 'error' in result),
+        'results': results
+    }), 201
+
 @app.route('/api/parse-post/<int:post_id>', methods=['POST'])
 def api_parse_post(post_id):
     """API endpoint для ручного запуска парсинга поста"""
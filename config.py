@@ -30,6 +30,19 @@ DEBUG = ENV == 'development'
 # VK API settings
 VK_TOKEN = os.environ.get('VK_TOKEN', '')
 
+# Срок актуальности имён в справочнике пользователей vk_user
+VK_USER_TTL = timedelta(days=30)
+# Максимальное количество id в одном запросе users.get
+VK_USERS_GET_BATCH = 1000
+# Общий лимит запросов к VK API в секунду (для всех потоков)
+VK_API_RATE_LIMIT = float(os.environ.get('VK_API_RATE_LIMIT', 3))
+# Метаданные поста моложе этого срока используются без повторного wall.getById
+VK_POST_META_MAX_AGE = timedelta(minutes=5)
+# Количество потоков для параллельной загрузки страниц
+VK_API_MAX_WORKERS = int(os.environ.get('VK_API_MAX_WORKERS', 3))
+# Максимальное количество постов в одном запросе wall.getById
+VK_WALL_GET_BY_ID_BATCH = 100
+
 # Timezone setting - Moscow time (UTC+3)
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 UTC_TZ = pytz.UTC
@@ -76,6 +89,86 @@ PARSE_OPTION_NOW = "now"            # Немедленный парсинг
 PARSE_OPTION_5MIN = "5min"          # За 5 минут до истечения 24 часов
 PARSE_OPTION_30MIN = "30min"        # За 30 минут до истечения 24 часов
 PARSE_OPTION_1HOUR = "1hour"        # За 1 час до истечения 24 часов
+PARSE_OPTIONS = (PARSE_OPTION_STANDARD, PARSE_OPTION_NOW, PARSE_OPTION_5MIN, PARSE_OPTION_30MIN, PARSE_OPTION_1HOUR)
+
+# Количество фоновых потоков обработки загруженных файлов
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+
+# Параллельное извлечение текста из PDF: число процессов и минимум страниц на задачу.
+# PDF и пакеты разбираются в одном общем пуле из max(PDF_WORKERS, BATCH_WORKERS) процессов
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', min(os.cpu_count() or 1, 4)))
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 10))
+
+# Массовое добавление постов через /api/posts/bulk: ссылок в одной транзакции
+BULK_INGEST_CHUNK = int(os.environ.get('BULK_INGEST_CHUNK', 1000))
+# JSON-тело /api/posts/bulk разбирается целиком, поэтому его размер ограничен, байт;
+# для больших списков нужно использовать NDJSON
+BULK_JSON_MAX_BYTES = int(os.environ.get('BULK_JSON_MAX_BYTES', 10 * 1024 * 1024))
+
+# Удаление файлов: постов (с их результатами) в одном пакете DELETE
+DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE', 500))
+
+# Пакетная загрузка (ZIP или несколько файлов): число процессов для разбора файлов пакета
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', min(os.cpu_count() or 1, 4)))
+# Ограничения пакета (защита от ZIP-бомб): число файлов отчетов в архиве
+# и их общий размер после распаковки, байт
+BATCH_MAX_MEMBERS = int(os.environ.get('BATCH_MAX_MEMBERS', 1000))
+BATCH_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('BATCH_MAX_UNCOMPRESSED_BYTES', 1024 * 1024 * 1024))
+
+# Повторная загрузка файла с тем же содержимым
+DUPLICATE_ACTION_LINK = "link"              # Привязать к уже созданным постам
+DUPLICATE_ACTION_RESCHEDULE = "reschedule"  # Создать посты заново из кэша извлечения
+
+# Минимальная уверенность во времени публикации из файла, при которой
+# запрос wall.getById для ссылки не выполняется
+PUBLISH_TIME_CONFIDENCE = float(os.environ.get('PUBLISH_TIME_CONFIDENCE', 0.8))
+
+# Поток SSE со статусом файла занимает рабочий процесс сервера: через
+# FILE_STATUS_STREAM_MAX_SECONDS он закрывается, и клиент переходит на опрос
+# /api/file-status раз в FILE_STATUS_POLL_SECONDS. Без изменений статуса
+# комментарий-пинг уходит раз в FILE_STATUS_STREAM_HEARTBEAT_SECONDS, чтобы
+# отключившийся клиент обнаруживался сразу
+FILE_STATUS_STREAM_MAX_SECONDS = float(os.environ.get('FILE_STATUS_STREAM_MAX_SECONDS', 120))
+FILE_STATUS_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('FILE_STATUS_STREAM_HEARTBEAT_SECONDS', 15))
+FILE_STATUS_POLL_SECONDS = int(os.environ.get('FILE_STATUS_POLL_SECONDS', 5))
+
+# Время жизни кэша счетчиков на главной странице, секунд
+DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 5))
+
+# Время жизни кэша общего количества записей в списках (архив, результаты, запланированные), секунд
+LISTING_COUNT_TTL = float(os.environ.get('LISTING_COUNT_TTL', 30))
+
+# Максимальное число SQL-запросов на один запрос к странице (по имени view).
+# Превышение пишется в лог; tests/test_query_budgets.py проверяет бюджеты всех view
+QUERY_BUDGETS = {
+    'index': 4,
+    'archive': 2,
+    'results': 2,
+    'scheduled': 2,
+    'file_detail': 4,
+    'result_detail': 12,
+    'api_result_activity': 6,
+    'api_files': 2,
+    'api_results': 2,
+    'api_scheduled': 2
+}
+
+# Списки активности на странице результата: элементов в срезе по умолчанию и максимум
+ACTIVITY_PAGE_SIZE = 50
+ACTIVITY_PAGE_MAX = 500
+
+# Потоковый экспорт результата: строк в одном отправляемом фрагменте ответа
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 1000))
+
+# Кэш готовых экспортов в RESULTS_DIR. Версию нужно увеличить при изменении
+# содержимого экспорта, чтобы старые файлы не отдавались
+EXPORT_SCHEMA_VERSION = 1
+# Предельный размер кэша экспортов, байт; сверх него удаляются давно не скачанные
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Parse modes
+PARSE_MODE_FULL = "full"  # Имена пользователей определяются во время парсинга
+PARSE_MODE_FAST = "fast"  # Только id, имена определяются при просмотре или экспорте
 
 # Default settings
 DEFAULT_SETTINGS = {
@@ -83,7 +176,9 @@ DEFAULT_SETTINGS = {
     'parse_time': '23:50',  # Время парсинга по умолчанию
     'export_format': 'txt',  # Формат результатов по умолчанию
     'parse_interval': 23.83,  # Часы между публикацией и парсингом
-    'default_parse_option': 'standard'
+    'default_parse_option': 'standard',
+    'parse_mode': PARSE_MODE_FULL,
+    'comment_threads': 'on'  # Собирать ответы в ветках комментариев
 }
 
 # Logging configuration
@@ -101,6 +196,8 @@ logging.basicConfig(
 )
 
 logger = logging.getLogger(__name__)
+# pdfminer (pdfplumber) пишет в DEBUG каждый токен PDF, что в разы замедляет разбор
+logging.getLogger('pdfminer').setLevel(logging.WARNING)
 
 # Добавляем информацию о запуске
 logger.info(f"Запуск приложения в режиме {ENV}")
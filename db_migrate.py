@@ -21,6 +21,112 @@ logging.basicConfig(
 
 logger = logging.getLogger("db_migrate")
 
+def add_missing_columns(db):
+    """Добавляет в существующие таблицы столбцы, появившиеся в моделях.
+
+    db.create_all() создает только отсутствующие таблицы, поэтому новые
+    nullable-столбцы добавляются через ALTER TABLE.
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"
+                ))
+            logger.info(f"Добавлен столбец {table.name}.{column.name}")
+
+def create_missing_indexes(db):
+    """Создает индексы моделей, которых нет в существующих таблицах.
+
+    db.create_all() создает индексы только вместе с новой таблицей. В PostgreSQL
+    индекс строится CONCURRENTLY, чтобы не блокировать запись в большую таблицу.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateIndex
+
+    inspector = inspect(db.engine)
+    concurrently = db.engine.dialect.name == 'postgresql'
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect))
+            if concurrently:
+                ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+            # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(ddl))
+            logger.info(f"Создан индекс {index.name} ({table.name})")
+
+# Миграции схемы по порядку версий. Каждая миграция должна быть идемпотентной:
+# на новой базе db.create_all() уже создал все по моделям, и миграция
+# только записывается в schema_migrations. Для новых столбцов или индексов
+# добавляется следующая версия с add_missing_columns или create_missing_indexes.
+MIGRATIONS = [
+    (1, 'Столбцы, добавленные в модели после создания таблиц', add_missing_columns),
+    (2, 'Индексы post(status, parse_time), post(file_id), parse_result(post_id), '
+        'parse_result(created_at), file(content_hash)', create_missing_indexes),
+    (3, 'Индекс file(uploaded_at) для постраничного вывода архива', create_missing_indexes),
+    # Перенос данных старых результатов в таблицу - не при запуске приложения,
+    # а командой python db_migrate.py --move-activity (или при открытии результата)
+    (4, 'Таблица activity_item для списков активности результатов', create_missing_indexes),
+]
+
+def run_migrations(db):
+    """Применяет миграции, которых еще нет в таблице schema_migrations.
+
+    Вызывается после db.create_all() в контексте приложения.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from models import SchemaMigration
+
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Применяется миграция {version}: {description}")
+        migrate(db)
+        db.session.add(SchemaMigration(version=version, description=description))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Миграцию одновременно применил другой процесс приложения
+            db.session.rollback()
+
+def show_migrations():
+    """Выводит список миграций и их состояние"""
+    from app import app
+    from models import SchemaMigration
+
+    with app.app_context():
+        applied = {migration.version: migration for migration in SchemaMigration.query.all()}
+    for version, description, _ in MIGRATIONS:
+        migration = applied.get(version)
+        state = f"применена {migration.applied_at:%d.%m.%Y %H:%M}" if migration else "не применена"
+        print(f"{version:>3}  {state:<28} {description}")
+
+def move_activity():
+    """Переносит JSON-списки активности старых результатов в таблицу activity_item"""
+    from app import app, db
+    from utils.activity import move_activity_blobs
+
+    with app.app_context():
+        moved = move_activity_blobs(db)
+    print(f"Перенесены списки активности {moved} результатов")
+
 def init_database():
     """Функция для инициализации базы данных"""
     from app import app, db
@@ -30,9 +136,10 @@ def init_database():
     logger.info("Начало инициализации базы данных")
     
     with app.app_context():
-        # Создаем таблицы, если их нет
+        # Создаем таблицы, если их нет, и применяем миграции к существующим
         db.create_all()
         logger.info("Таблицы созданы или уже существуют")
+        run_migrations(db)
         
         # Инициализируем настройки
         for key, value in DEFAULT_SETTINGS.items():
@@ -76,12 +183,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Миграция базы данных VK Parser')
     parser.add_argument('--backup', help='Директория для резервной копии', default='./backup')
     parser.add_argument('--skip-backup', action='store_true', help='Пропустить создание резервной копии')
+    parser.add_argument('--status', action='store_true', help='Показать состояние миграций и выйти')
+    parser.add_argument('--move-activity', action='store_true',
+                        help='Перенести списки активности старых результатов в таблицу activity_item')
     
     args = parser.parse_args()
     
+    if args.status:
+        show_migrations()
+        raise SystemExit(0)
+    
     # Создаем резервную копию, если не пропущено
     if not args.skip_backup:
         backup_database(args.backup)
     
     # Инициализируем базу данных
-    init_database()
\ No newline at end of file
+    init_database()
+    
+    if args.move_activity:
+        move_activity()
\ No newline at end of file
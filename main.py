@@ -1,4 +1,7 @@
-from app import app
+# Процессы извлечения PDF/ZIP (spawn) заново выполняют этот файл как
+# __mp_main__: приложение (БД, миграции, планировщик) в них не создается
+if __name__ != "__mp_main__":
+    from app import app
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -23,8 +23,23 @@ class Post(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed
     created_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
     
+    # Метаданные поста из VK API, сохраняются при загрузке и обновляются при парсинге
+    owner_id = db.Column(db.BigInteger, nullable=True)
+    item_id = db.Column(db.BigInteger, nullable=True)
+    post_type = db.Column(db.String(20), nullable=True)  # wall, market, adblogger
+    likes_count = db.Column(db.Integer, nullable=True)
+    comments_count = db.Column(db.Integer, nullable=True)
+    reposts_count = db.Column(db.Integer, nullable=True)
+    meta_fetched_at = db.Column(db.DateTime, nullable=True)
+    
     # Relationship with the File model
     file = db.relationship('File', backref=db.backref('posts', lazy=True))
+    
+    # Ожидающие посты по времени парсинга (планировщик, /scheduled) и посты файла
+    __table_args__ = (
+        db.Index('ix_post_status_parse_time', 'status', 'parse_time'),
+        db.Index('ix_post_file_id', 'file_id'),
+    )
 
     def __repr__(self):
         return f'<Post {self.link}>'
@@ -65,8 +80,24 @@ class File(db.Model):
     file_type = db.Column(db.String(10), nullable=False)  # html, pdf, txt
     status = db.Column(db.String(20), default='processing')  # processing, processed, failed
     parse_option = db.Column(db.String(20), default='standard')
+    parse_mode = db.Column(db.String(20), nullable=True)  # full, fast; None - глобальная настройка
     uploaded_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
     
+    # Прогресс фоновой обработки файла
+    links_found = db.Column(db.Integer, nullable=True)
+    links_resolved = db.Column(db.Integer, nullable=True)
+    posts_created = db.Column(db.Integer, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    
+    # SHA-256 содержимого и файл, к постам которого привязана повторная загрузка
+    content_hash = db.Column(db.String(64), nullable=True)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('file.id'), nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_file_content_hash', 'content_hash'),
+        db.Index('ix_file_uploaded_at', 'uploaded_at'),
+    )
+    
     def __repr__(self):
         return f'<File {self.filename}>'
         
@@ -87,13 +118,21 @@ class ParseResult(db.Model):
     likes_count = db.Column(db.Integer, default=0)
     comments_count = db.Column(db.Integer, default=0)
     reposts_count = db.Column(db.Integer, default=0)
-    likes_data = db.Column(db.Text)  # JSON data of users who liked
-    comments_data = db.Column(db.Text)  # JSON data of users who commented
-    reposts_data = db.Column(db.Text)  # JSON data of users who reposted
+    # JSON-списки активности результатов до перехода на activity_item; новые результаты их не заполняют.
+    # Отложенная загрузка: читаются только при переносе в activity_item
+    likes_data = db.deferred(db.Column(db.Text))  # JSON data of users who liked
+    comments_data = db.deferred(db.Column(db.Text))  # JSON data of users who commented
+    reposts_data = db.deferred(db.Column(db.Text))  # JSON data of users who reposted
+    metrics_data = db.Column(db.Text)  # JSON parse metrics (API calls, bytes, decode time)
     created_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
     
     # Relationship with the Post model
     post = db.relationship('Post', backref=db.backref('results', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_parse_result_post_id', 'post_id'),
+        db.Index('ix_parse_result_created_at', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<ParseResult for post {self.post_id}>'
@@ -106,3 +145,68 @@ class ParseResult(db.Model):
         if self.created_at and self.created_at.tzinfo is None:
             return self.created_at.replace(tzinfo=MOSCOW_TZ)
         return to_moscow_time(self.created_at) if self.created_at else None
+
+
+class ActivityItem(db.Model):
+    """One liker, commenter or reposter of a parse result, in list order"""
+    __tablename__ = 'activity_item'
+
+    id = db.Column(db.Integer, primary_key=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('parse_result.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # likes, comments, reposts
+    position = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.BigInteger, nullable=True)
+    name = db.Column(db.String(255), nullable=True)  # None - имя еще не определено (быстрый режим)
+    text = db.Column(db.Text, nullable=True)  # Текст комментария
+    search_text = db.Column(db.Text, nullable=True)  # Имя и текст в нижнем регистре для поиска
+
+    # Срезы списка читаются по (result_id, kind, position)
+    __table_args__ = (
+        db.Index('ix_activity_item_result_kind_position', 'result_id', 'kind', 'position', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<ActivityItem {self.kind} #{self.position} of result {self.result_id}>'
+
+
+class VKUser(db.Model):
+    """Local directory of VK users used as a read-through cache for names"""
+    __tablename__ = 'vk_user'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    first_name = db.Column(db.String(255), default='')
+    last_name = db.Column(db.String(255), default='')
+    fetched_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
+
+    def __repr__(self):
+        return f'<VKUser {self.id}>'
+
+    @property
+    def full_name(self):
+        """Имя и фамилия пользователя одной строкой"""
+        return f"{self.first_name or ''} {self.last_name or ''}"
+
+
+class ExtractionCache(db.Model):
+    """Links and per-link publish times extracted from a file, keyed by content hash"""
+    __tablename__ = 'extraction_cache'
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    publish_time = db.Column(db.DateTime, nullable=True)
+    links_data = db.Column(db.Text)  # JSON [[link, publish time ISO or null, confidence], ...]
+    created_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
+
+    def __repr__(self):
+        return f'<ExtractionCache {self.content_hash}>'
+
+
+class SchemaMigration(db.Model):
+    """Applied schema migrations, see db_migrate.MIGRATIONS"""
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255))
+    applied_at = db.Column(db.DateTime, default=lambda: get_now_moscow().replace(tzinfo=None))
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
@@ -0,0 +1,61 @@
+"""Benchmark parse_txt_file across encodings and file sizes.
+
+Writes a Cyrillic TXT report ("Пост от 27.03.2024 08:53 <link> <text>")
+in each encoding and size and prints MB/s and the peak RSS of the
+extracting process. utf-8 and cp1251 are scanned on the mapped bytes,
+utf-16 goes through the streaming decoder.
+
+    python scripts/bench_encodings.py [--sizes-mb 20,100] [--encodings utf-8,cp1251,utf-16]
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from benchutil import measure, baseline_rss, report
+
+from utils.file_processor import parse_txt_file  # noqa: E402
+
+NOW = datetime(2024, 3, 28, 12, 0)
+BLOCK_LINES = 10000
+
+def write_report(path, size, encoding):
+    """Write about size bytes of report lines in encoding, returns the number of links"""
+    number, written = 0, 0
+    # utf-16 writes its BOM once at the start of the file
+    with open(path, 'w', encoding=encoding) as f:
+        while written < size:
+            lines = []
+            for _ in range(BLOCK_LINES):
+                stamp = (NOW - timedelta(minutes=number % 100000)).strftime('%d.%m.%Y %H:%M')
+                lines.append(f"Пост от {stamp} https://vk.com/wall-{100 + number % 5000}_{number} "
+                             f"Текст поста номер {number}, охват и реакции\n")
+                number += 1
+            f.write(''.join(lines))
+            written = f.tell()
+    return number
+
+def extract(path):
+    links, publish_time, link_times = parse_txt_file(path, NOW)
+    return len(links), len(link_times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes-mb', default='20,100')
+    parser.add_argument('--encodings', default='utf-8,cp1251,utf-16')
+    args = parser.parse_args()
+
+    print(f"Peak RSS after imports: {baseline_rss():.0f} MB")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in (int(size) for size in args.sizes_mb.split(',')):
+            for encoding in args.encodings.split(','):
+                path = os.path.join(directory, 'report.txt')
+                expected = write_report(path, size_mb * 2**20, encoding)
+                size = os.path.getsize(path)
+                elapsed, peak_rss, (links, timed) = measure(extract, path)
+                report(f"{encoding} {size / 2**20:.0f} MB", size, elapsed, peak_rss,
+                       f"links {links}/{expected}, with time {timed}")
+                os.remove(path)
+
+if __name__ == '__main__':
+    main()
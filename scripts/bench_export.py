@@ -0,0 +1,81 @@
+"""Benchmark the Excel export of parse results with large activity lists.
+
+For each --likes N it stores a result with N likes, N/5 comments and 10
+reposts in the database from DATABASE_URL, then requests
+/results/<id>/export with the export format set to Excel and reads the
+whole response, printing the time and the peak RSS of the exporting
+process. Seeding and export run in separate processes, so the peak RSS is
+that of one export request. Point it at a scratch database.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/bench_export.py [--likes 10000,100000]
+"""
+import argparse
+import tempfile
+from datetime import datetime
+
+from benchutil import measure, baseline_rss, report
+
+from app import app, db  # noqa: E402
+import utils.export as export  # noqa: E402
+
+NOW = datetime(2024, 3, 28, 12, 0)
+REPOSTS = 10
+
+def seed(likes):
+    """Store a parse result with the activity lists, returns its id"""
+    from models import Post, ParseResult
+    from utils.activity import store_activity
+
+    with app.app_context():
+        # Соединения родительского процесса не переиспользуются после fork
+        db.engine.dispose()
+        post = Post(link=f"https://vk.com/wall-1_{likes}", publish_time=NOW, parse_time=NOW, status='completed')
+        db.session.add(post)
+        db.session.flush()
+        result = ParseResult(post_id=post.id, likes_count=likes, comments_count=likes // 5,
+                             reposts_count=REPOSTS)
+        db.session.add(result)
+        db.session.flush()
+        store_activity(db, result.id, {
+            'likes': [{'id': n + 1, 'name': f"Пользователь {n}"} for n in range(likes)],
+            'comments': [{'id': n + 1, 'name': f"Пользователь {n}", 'text': f"Комментарий номер {n}"}
+                         for n in range(likes // 5)],
+            'reposts': [{'id': n + 1, 'name': f"Пользователь {n}"} for n in range(REPOSTS)]
+        })
+        db.session.commit()
+        return result.id
+
+def download(result_id):
+    """Request the export and read the response body, returns its size in bytes"""
+    with app.app_context():
+        db.engine.dispose()
+    response = app.test_client().get(f"/results/{result_id}/export")
+    assert response.status_code == 200, response.status
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+def main():
+    from models import Settings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--likes', default='10000,100000')
+    args = parser.parse_args()
+
+    with app.app_context():
+        Settings.query.filter_by(key='export_format').first().value = 'excel'
+        db.session.commit()
+        db.engine.dispose()
+
+    print(f"Peak RSS after imports: {baseline_rss():.0f} MB")
+    with tempfile.TemporaryDirectory() as directory:
+        # Кэш экспортов во временной директории, а не в results/
+        export.RESULTS_DIR = directory
+        for likes in (int(value) for value in args.likes.split(',')):
+            seconds, _, result_id = measure(seed, likes)
+            elapsed, peak_rss, size = measure(download, result_id)
+            report(f"{likes} likes", size, elapsed, peak_rss,
+                   f"{size / 2**20:.1f} MB workbook, seeded in {seconds:.1f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Benchmark the hot queries with and without the indexes of migration 2.
+
+Seeds the database from DATABASE_URL, if it has no posts yet, with --posts
+posts (5% pending, parse times from two hours ago to a month ahead; the
+rest completed, 60% of all posts with a parse result) and one file per 50
+posts. Each query runs through the ORM as the app runs it and the median
+of --runs is printed. The indexes of migration 2 are dropped first and
+rebuilt with create_missing_indexes, which is timed as the migration.
+Point it at a scratch database: it is filled and its indexes dropped.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/bench_indexes.py [--posts 1000000] [--runs 5]
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+import schedule
+
+from benchutil import baseline_rss
+
+from app import app, db, results_page, scheduled_page  # noqa: E402
+from config import get_now_moscow  # noqa: E402
+from db_migrate import create_missing_indexes  # noqa: E402
+import utils.pagination as pagination  # noqa: E402
+
+# Индексы миграции 2
+INDEXES = ('ix_post_status_parse_time', 'ix_post_file_id', 'ix_parse_result_post_id',
+           'ix_parse_result_created_at', 'ix_file_content_hash')
+POSTS_PER_FILE = 50
+PENDING_EVERY = 20
+# Из каждых PENDING_EVERY постов результат есть у WITH_RESULT завершенных (60%)
+WITH_RESULT = 12
+BATCH = 10000
+
+def seed(posts):
+    """Insert files, posts and parse results with multi-row INSERTs"""
+    from sqlalchemy import insert
+    from models import File, Post, ParseResult
+
+    now = get_now_moscow().replace(tzinfo=None)
+    files = -(-posts // POSTS_PER_FILE)
+    for start in range(0, files, BATCH):
+        db.session.execute(insert(File), [
+            {'id': i + 1, 'filename': f"report_{i}.txt", 'file_path': f"uploads/report_{i}.txt",
+             'file_type': 'txt', 'status': 'processed', 'content_hash': f"{i:064x}",
+             'uploaded_at': now - timedelta(minutes=files - i)}
+            for i in range(start, min(start + BATCH, files))
+        ])
+    pending_window = 30 * 24 * 60
+    for start in range(0, posts, BATCH):
+        post_rows, result_rows = [], []
+        for i in range(start, min(start + BATCH, posts)):
+            published = now - timedelta(minutes=posts - i)
+            if i % PENDING_EVERY == 0:
+                parse_time = now - timedelta(hours=2) + timedelta(minutes=(i * 7919) % pending_window)
+                status = 'pending'
+            else:
+                parse_time, status = published + timedelta(hours=23, minutes=50), 'completed'
+            post_rows.append({'id': i + 1, 'link': f"https://vk.com/wall-{100 + i % 5000}_{i}",
+                              'file_id': i // POSTS_PER_FILE + 1, 'publish_time': published,
+                              'parse_time': parse_time, 'status': status, 'created_at': published})
+            if 0 < i % PENDING_EVERY <= WITH_RESULT:
+                result_rows.append({'post_id': i + 1, 'likes_count': 3, 'comments_count': 2,
+                                    'reposts_count': 1, 'created_at': parse_time})
+        db.session.execute(insert(Post), post_rows)
+        if result_rows:
+            db.session.execute(insert(ParseResult), result_rows)
+    db.session.commit()
+
+def cases():
+    """(label, query function returning the number of rows) as the app runs them"""
+    from sqlalchemy.orm import selectinload
+    from models import File, Post, ParseResult
+
+    post_count = Post.query.count()
+    file_id = File.query.count() // 2
+    post_id = db.session.query(ParseResult.post_id).order_by(ParseResult.id) \
+        .offset(ParseResult.query.count() // 2).limit(1).scalar()
+    content_hash = f"{file_id - 1:064x}"
+
+    def check_pending_posts():
+        ahead = get_now_moscow().replace(tzinfo=None) + timedelta(minutes=5)
+        return len(Post.query.filter(Post.status == 'pending', Post.parse_time <= ahead).all())
+
+    def scheduled():
+        with app.test_request_context('/scheduled'):
+            return len(scheduled_page(get_now_moscow()).items)
+
+    def file_detail():
+        return len(Post.query.filter_by(file_id=file_id)
+                   .options(selectinload(Post.results).load_only(ParseResult.id)).all())
+
+    def results():
+        with app.test_request_context('/results'):
+            return len(results_page().items)
+
+    def post_results():
+        return len(ParseResult.query.filter_by(post_id=post_id).all())
+
+    def dedupe():
+        return int(File.query.filter_by(content_hash=content_hash, status='processed', duplicate_of_id=None)
+                   .order_by(File.uploaded_at.desc()).first() is not None)
+
+    print(f"{post_count} posts, {File.query.count()} files, {ParseResult.query.count()} parse results")
+    return [
+        ('check_pending_posts', check_pending_posts),
+        ('/scheduled page 1', scheduled),
+        ('file_detail posts', file_detail),
+        ('/results page 1', results),
+        ('post.results', post_results),
+        ('upload dedupe by hash', dedupe),
+    ]
+
+def time_case(query, runs):
+    """Median seconds of runs calls and the number of rows; listing totals are counted every time"""
+    timings = []
+    for _ in range(runs):
+        pagination._count_cache.clear()
+        db.session.expunge_all()
+        started = time.perf_counter()
+        rows = query()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), rows
+
+def main():
+    from sqlalchemy import text
+    from models import Post
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Периодическая проверка планировщика не должна парсить тестовые посты
+    schedule.clear()
+    with app.app_context():
+        print(f"Database {db.engine.url.get_backend_name()}")
+        if not Post.query.first():
+            started = time.perf_counter()
+            seed(args.posts)
+            print(f"Seeded in {time.perf_counter() - started:.1f} s")
+        queries = cases()
+
+        for name in INDEXES:
+            db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+        before = [time_case(query, args.runs) for label, query in queries]
+
+        started = time.perf_counter()
+        create_missing_indexes(db)
+        migration = time.perf_counter() - started
+        after = [time_case(query, args.runs) for label, query in queries]
+
+    for (label, query), (old, rows), (new, _) in zip(queries, before, after):
+        print(f"  {label}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms ({rows} rows)")
+    print(f"Migration 2 indexes built in {migration:.1f} s; peak RSS {baseline_rss():.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark process_file on a generated TXT report, from upload to "processed".
+
+Writes a report with one post per line ("Пост от 27.03.2024 08:53 <link>",
+every link unique), so every publish time is taken from the file and no
+wall.getById calls are made. Times fall within the last 20 hours, so with
+the standard option no post is due yet. For each parse option it creates a
+File row and runs process_file on it, printing posts/s and the peak RSS of
+the ingesting process. Posts are written to the database from DATABASE_URL
+(SQLite or PostgreSQL); point it at a scratch database.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/bench_ingest.py [--links 5000] [--options standard,now]
+"""
+import argparse
+import os
+import tempfile
+from datetime import timedelta
+
+from benchutil import measure, baseline_rss, report
+
+from app import app, db  # noqa: E402
+from config import get_now_moscow  # noqa: E402
+from utils.file_processor import process_file  # noqa: E402
+
+NOW = get_now_moscow().replace(tzinfo=None, second=0, microsecond=0)
+# Ссылки распределены по последним WINDOW_MINUTES минутам
+WINDOW_MINUTES = 1200
+
+def write_report(path, links):
+    """Write a TXT report with one timed link per line"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for number in range(links):
+            stamp = (NOW - timedelta(minutes=number % WINDOW_MINUTES)).strftime('%d.%m.%Y %H:%M')
+            f.write(f"Пост от {stamp} https://vk.com/wall-{100 + number % 5000}_{number} Текст поста\n")
+
+def ingest(file_id):
+    from models import File
+
+    with app.app_context():
+        # Соединения родительского процесса не переиспользуются после fork
+        db.engine.dispose()
+    process_file(file_id, app)
+    with app.app_context():
+        file = File.query.get(file_id)
+        return file.status, file.posts_created
+
+def main():
+    from models import File, Settings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--links', type=int, default=5000)
+    parser.add_argument('--options', default='standard,now')
+    args = parser.parse_args()
+
+    with app.app_context():
+        backend = db.engine.url.get_backend_name()
+    print(f"Peak RSS after imports: {baseline_rss():.0f} MB, database {backend}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'report.txt')
+        write_report(path, args.links)
+        size = os.path.getsize(path)
+        for option in args.options.split(','):
+            with app.app_context():
+                # process_file requires a token even when no API calls are made
+                token = Settings.query.filter_by(key='vk_token').first()
+                if not token.value:
+                    token.value = 'benchmark'
+                file = File(filename='report.txt', file_path=path, file_type='txt',
+                            parse_option=option, uploaded_at=NOW)
+                db.session.add(file)
+                db.session.commit()
+                file_id = file.id
+                db.engine.dispose()
+            elapsed, peak_rss, (status, posts) = measure(ingest, file_id)
+            report(f"{option}, {args.links} links", size, elapsed, peak_rss,
+                   f"{status}, {posts} posts, {posts / elapsed:.0f} posts/s")
+
+if __name__ == '__main__':
+    main()
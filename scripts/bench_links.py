@@ -0,0 +1,59 @@
+"""Benchmark extract_vk_links on generated link-dense text.
+
+The text mixes the link forms that are canonicalized to one key
+(vk.com/wall-1_2, m.vk.com, www.vk.com, vk.com/name?w=wall-1_2, trailing
+query strings, market links) and repeats each post --repeats times in
+different forms. Prints MB/s, unique links and the peak RSS of the
+extracting process.
+
+    python scripts/bench_links.py [--size-mb 50] [--repeats 3]
+"""
+import argparse
+
+from benchutil import measure, baseline_rss, report
+
+from utils.file_processor import extract_vk_links  # noqa: E402
+
+WALL_FORMS = (
+    "https://vk.com/wall-{owner}_{item}",
+    "https://m.vk.com/wall-{owner}_{item}?from=feed",
+    "https://www.vk.com/club{owner}?w=wall-{owner}_{item}",
+    "https://vk.com/public{owner}?w=wall-{owner}_{item}&z=photo",
+)
+MARKET_FORMS = (
+    "https://vk.com/market-{owner}_{item}",
+    "https://m.vk.com/market-{owner}_{item}?w=product",
+)
+# Every MARKET_EVERY-th post is a market item
+MARKET_EVERY = 5
+
+def generate_text(size, repeats):
+    """Link-dense text of about size characters, returns (text, expected unique links)"""
+    parts, length, post = [], 0, 0
+    while length < size:
+        forms = MARKET_FORMS if post % MARKET_EVERY == 0 else WALL_FORMS
+        for repeat in range(repeats):
+            part = forms[(post + repeat) % len(forms)].format(owner=100 + post % 5000, item=post) + " пост \n"
+            parts.append(part)
+            length += len(part)
+        post += 1
+    return ''.join(parts), post
+
+def extract(text):
+    return len(extract_vk_links(text))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    text, expected = generate_text(args.size_mb * 2**20, args.repeats)
+    size = len(text.encode('utf-8'))
+    print(f"Peak RSS with the generated text: {baseline_rss():.0f} MB")
+    elapsed, peak_rss, links = measure(extract, text)
+    report(f"extract_vk_links, {size / 2**20:.0f} MB", size, elapsed, peak_rss,
+           f"unique links {links}/{expected} from {text.count('://')} matches")
+
+if __name__ == '__main__':
+    main()
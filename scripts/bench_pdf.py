@@ -0,0 +1,112 @@
+"""Benchmark PDF link extraction on a generated report.
+
+Writes a PDF with one post per line ("27.03.2024 08:53  <link>") and
+measures extraction with the links as URI annotations over short anchor
+text (annotation path) and as plain URL text (text layout path), then
+parse_pdf_file in this process and in the shared process pool (the first
+pool run includes starting the workers; the pool size is taken from
+PDF_WORKERS/BATCH_WORKERS).
+
+    PDF_WORKERS=4 python scripts/bench_pdf.py [--pages 200] [--links-per-page 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PUBLISH_TIME_CONFIDENCE, PDF_WORKERS, BATCH_WORKERS  # noqa: E402
+from utils.file_processor import extract_pdf_page_range, parse_pdf_file  # noqa: E402
+
+NOW = datetime(2024, 3, 28, 12, 0)
+
+def post_time(number):
+    return NOW - timedelta(minutes=7 * number + 1)
+
+def write_pdf(path, pages, links_per_page, annotated):
+    """Minimal PDF: Helvetica text lines, optionally with Link annotations"""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    next_id = 4
+    for page in range(pages):
+        lines, annots = [], []
+        for row in range(links_per_page):
+            number = page * links_per_page + row
+            url = f"https://vk.com/wall-{100 + number % 50}_{number}"
+            y = 800 - row * 36
+            stamp = post_time(number).strftime('%d.%m.%Y %H:%M')
+            lines.append(f"BT /F1 10 Tf 40 {y} Td ({stamp}  {'Open post' if annotated else url}) Tj ET")
+            if annotated:
+                annot_id = next_id
+                next_id += 1
+                objects[annot_id] = (
+                    f"<< /Type /Annot /Subtype /Link /Rect [135 {y - 2} 185 {y + 10}] /Border [0 0 0] "
+                    f"/A << /S /URI /URI ({url}) >> >>"
+                ).encode()
+                annots.append(f"{annot_id} 0 R")
+        content = '\n'.join(lines).encode()
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Annots [{' '.join(annots)}] >>"
+        ).encode()
+        page_ids.append(page_id)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {pages} >>".encode()
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for object_id in sorted(objects):
+            offsets[object_id] = f.tell()
+            f.write(b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (max(objects) + 1))
+        for object_id in range(1, max(objects) + 1):
+            f.write(b"%010d 00000 n \n" % offsets[object_id])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (max(objects) + 1, xref))
+
+def run(path, pages, links_per_page):
+    started = time.perf_counter()
+    links, publish_time, link_times, stats = extract_pdf_page_range(path, 0, pages, NOW)
+    elapsed = time.perf_counter() - started
+
+    expected = pages * links_per_page
+    correct = sum(
+        1 for number in range(expected)
+        if link_times.get(f"https://vk.com/wall-{100 + number % 50}_{number}", (None, 0))[0] == post_time(number)
+    )
+    confident = sum(1 for _, confidence in link_times.values() if confidence >= PUBLISH_TIME_CONFIDENCE)
+    print(f"  {elapsed:.2f} s, {pages / elapsed:.0f} pages/s; links {len(links)}/{expected}, "
+          f"correct time {correct}, confident (>= {PUBLISH_TIME_CONFIDENCE}) {confident}; "
+          f"document time {publish_time}; annotation pages {stats['annotation_pages']}, text pages {stats['text_pages']}")
+
+def run_parse(path, pages, workers, label):
+    started = time.perf_counter()
+    links = parse_pdf_file(path, workers=workers, now=NOW)[0]
+    elapsed = time.perf_counter() - started
+    print(f"  parse_pdf_file, {label}: {elapsed:.2f} s, {pages / elapsed:.0f} pages/s, {len(links)} links")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--links-per-page', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for annotated in (True, False):
+            path = os.path.join(directory, 'report.pdf')
+            write_pdf(path, args.pages, args.links_per_page, annotated)
+            print(f"{'annotation' if annotated else 'text'} path, {args.pages} pages, "
+                  f"{os.path.getsize(path) / 2**20:.1f} MB:")
+            run(path, args.pages, args.links_per_page)
+            run_parse(path, args.pages, 1, 'in process')
+            for attempt in ('pool', 'pool, again'):
+                run_parse(path, args.pages, max(PDF_WORKERS, BATCH_WORKERS), f"{attempt} of {max(PDF_WORKERS, BATCH_WORKERS)}")
+
+if __name__ == '__main__':
+    main()
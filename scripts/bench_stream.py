@@ -0,0 +1,70 @@
+"""Benchmark streaming link extraction on large generated TXT and HTML reports.
+
+Writes a report of --size-mb with one post per line ("27.03.2024 08:53
+<link> <filler>", as table rows for HTML; every link is unique) and
+runs parse_txt_file and parse_html_file on it, printing MB/s and the peak
+RSS of the extracting process. Peak RSS includes the mapped pages of the
+TXT file; the rest is mostly the set of unique links.
+
+    python scripts/bench_stream.py [--size-mb 500] [--line-bytes 400]
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from benchutil import measure, baseline_rss, report
+
+from utils.file_processor import parse_txt_file, parse_html_file  # noqa: E402
+
+NOW = datetime(2024, 3, 28, 12, 0)
+BLOCK_LINES = 10000
+
+def write_report(path, size, line_bytes, html):
+    """Write about size bytes of report lines, returns the number of links"""
+    number, written = 0, 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if html:
+            f.write("<html><body><table>\n")
+        while written < size:
+            lines = []
+            for _ in range(BLOCK_LINES):
+                stamp = (NOW - timedelta(minutes=number % 100000)).strftime('%d.%m.%Y %H:%M')
+                link = f"https://vk.com/wall-{100 + number % 5000}_{number}"
+                if html:
+                    line = f'<tr><td>{stamp}</td><td><a href="{link}">{link}</a></td><td>'
+                    end = "</td></tr>\n"
+                else:
+                    line, end = f"{stamp} {link} ", "\n"
+                lines.append(line + 'x' * max(line_bytes - len(line) - len(end), 0) + end)
+                number += 1
+            block = ''.join(lines)
+            f.write(block)
+            written += len(block)
+        if html:
+            f.write("</table></body></html>\n")
+    return number
+
+def extract(parse, path):
+    links, publish_time, link_times = parse(path, NOW)
+    return len(links), len(link_times), publish_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=500)
+    parser.add_argument('--line-bytes', type=int, default=400)
+    args = parser.parse_args()
+
+    print(f"Peak RSS after imports: {baseline_rss():.0f} MB")
+    with tempfile.TemporaryDirectory() as directory:
+        for html, parse in ((False, parse_txt_file), (True, parse_html_file)):
+            path = os.path.join(directory, 'report.html' if html else 'report.txt')
+            expected = write_report(path, args.size_mb * 2**20, args.line_bytes, html)
+            size = os.path.getsize(path)
+            elapsed, peak_rss, (links, timed, publish_time) = measure(extract, parse, path)
+            report(f"{'HTML' if html else 'TXT'} {size / 2**20:.0f} MB", size, elapsed, peak_rss,
+                   f"links {links}/{expected}, with time {timed}, document time {publish_time}")
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
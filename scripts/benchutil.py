@@ -0,0 +1,37 @@
+"""Helpers shared by the extraction benchmarks in scripts/."""
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _measure_child(queue, fn, args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, result))
+
+def measure(fn, *args):
+    """Run fn(*args) in a forked process; returns (seconds, peak RSS in MB, result).
+
+    A fresh process per case keeps the peak RSS of one case from hiding the
+    next. The result must be picklable and small (e.g. counts).
+    """
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_measure_child, args=(queue, fn, args))
+    process.start()
+    elapsed, peak_rss, result = queue.get()
+    process.join()
+    return elapsed, peak_rss, result
+
+def baseline_rss():
+    """Peak RSS of this process in MB (imports included), for comparison with measure()"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def report(label, size, elapsed, peak_rss, details=''):
+    print(f"  {label}: {elapsed:.2f} s, {size / 2**20 / elapsed:.1f} MB/s, peak RSS {peak_rss:.0f} MB"
+          + (f"; {details}" if details else ''))
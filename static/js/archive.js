@@ -79,8 +79,100 @@ document.addEventListener('DOMContentLoaded', function() {
         if (batchActionBtn) {
             updateBatchActionButton();
         }
+        
+        // Confirm deletion of the selected files
+        const batchDeleteForm = document.getElementById('batchDeleteForm');
+        if (batchDeleteForm) {
+            batchDeleteForm.addEventListener('submit', function(event) {
+                const selectedCount = Array.from(fileCheckboxes).filter(cb => cb.checked).length;
+                if (!confirm(`Удалить выбранные файлы (${selectedCount}) со всеми постами и результатами парсинга? Это действие нельзя отменить.`)) {
+                    event.preventDefault();
+                }
+            });
+        }
     }
     
+    // Update status badge from /api/file-status data
+    function updateFileStatusBadge(fileId, data) {
+        const statusBadge = document.getElementById(`file-status-${fileId}`);
+        if (!statusBadge) return;
+        
+        // Remove existing status classes
+        statusBadge.classList.remove('bg-warning', 'bg-success', 'bg-danger');
+        
+        // Add appropriate class
+        if (data.status === 'processing') {
+            statusBadge.classList.add('bg-warning');
+            if (data.links_found) {
+                statusBadge.textContent = `Обработка ${data.links_resolved || 0}/${data.links_found}`;
+            } else {
+                statusBadge.textContent = 'Обработка';
+            }
+        } else if (data.status === 'processed') {
+            statusBadge.classList.add('bg-success');
+            statusBadge.textContent = 'Обработан';
+        } else {
+            statusBadge.classList.add('bg-danger');
+            statusBadge.textContent = 'Ошибка';
+            statusBadge.title = data.error || '';
+        }
+    }
+    
+    // Poll /api/file-status until the file is no longer processing
+    function pollFileStatus(fileId, url, interval) {
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.status || data.status === 'error') return;
+                updateFileStatusBadge(fileId, data);
+                if (data.status === 'processing') {
+                    setTimeout(() => pollFileStatus(fileId, url, interval), interval * 1000);
+                }
+            })
+            .catch(() => setTimeout(() => pollFileStatus(fileId, url, interval), interval * 1000));
+    }
+    
+    // Follow progress of files that are still processing via server-sent events.
+    // The server ends a long stream with a "poll" event; after it, or if the
+    // stream fails, progress is polled instead
+    const processingBadges = document.querySelectorAll('[data-status="processing"]');
+    const defaultPollInterval = 5;
+    processingBadges.forEach(badge => {
+        const fileId = badge.getAttribute('data-file-id');
+        const statusUrl = `/api/file-status/${fileId}`;
+        if (!window.EventSource) {
+            pollFileStatus(fileId, statusUrl, defaultPollInterval);
+            return;
+        }
+        
+        const source = new EventSource(`/api/file-status/${fileId}/stream`);
+        let finished = false;
+        
+        source.onmessage = function(event) {
+            const data = JSON.parse(event.data);
+            updateFileStatusBadge(fileId, data);
+            if (data.status !== 'processing') {
+                finished = true;
+                source.close();
+            }
+        };
+        
+        source.addEventListener('poll', function(event) {
+            const poll = JSON.parse(event.data);
+            finished = true;
+            source.close();
+            pollFileStatus(fileId, poll.url, poll.interval);
+        });
+        
+        source.onerror = function() {
+            source.close();
+            if (!finished) {
+                finished = true;
+                pollFileStatus(fileId, statusUrl, defaultPollInterval);
+            }
+        };
+    });
+    
     // Handle refresh file status
     const refreshButtons = document.querySelectorAll('.refresh-file-status');
     
@@ -99,23 +191,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     .then(response => response.json())
                     .then(data => {
                         // Update status display
-                        const statusBadge = document.getElementById(`file-status-${fileId}`);
-                        if (statusBadge) {
-                            // Remove existing status classes
-                            statusBadge.classList.remove('bg-warning', 'bg-success', 'bg-danger');
-                            
-                            // Add appropriate class
-                            if (data.status === 'processing') {
-                                statusBadge.classList.add('bg-warning');
-                                statusBadge.textContent = 'Обработка';
-                            } else if (data.status === 'processed') {
-                                statusBadge.classList.add('bg-success');
-                                statusBadge.textContent = 'Обработан';
-                            } else {
-                                statusBadge.classList.add('bg-danger');
-                                statusBadge.textContent = 'Ошибка';
-                            }
-                        }
+                        updateFileStatusBadge(fileId, data);
                         
                         // Reset button
                         this.innerHTML = originalHTML;
@@ -0,0 +1,95 @@
+/**
+ * JavaScript functionality for the result detail page:
+ * activity lists are loaded in slices on scroll and searched on the server
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    // Build a list item with the same markup as the server-rendered ones
+    function renderItem(item, kind) {
+        const element = document.createElement('div');
+        element.className = 'list-group-item';
+
+        const row = document.createElement('div');
+        row.className = 'd-flex justify-content-between align-items-center';
+
+        const name = document.createElement('span');
+        const icon = document.createElement('i');
+        icon.className = 'fas fa-user me-2';
+        name.appendChild(icon);
+        name.appendChild(document.createTextNode(' ' + (item.name || 'Неизвестный пользователь')));
+
+        const profile = document.createElement('a');
+        profile.href = `https://vk.com/id${item.id}`;
+        profile.target = '_blank';
+        profile.className = 'btn btn-sm btn-outline-primary';
+        profile.innerHTML = '<i class="fab fa-vk me-1"></i> Профиль';
+
+        row.appendChild(name);
+        row.appendChild(profile);
+        element.appendChild(row);
+
+        if (kind === 'comments' && item.text) {
+            const text = document.createElement('div');
+            text.className = 'mt-2 p-2 bg-dark rounded';
+            text.innerHTML = '<i class="fas fa-quote-left me-2 small"></i>';
+            text.appendChild(document.createTextNode(item.text));
+            element.appendChild(text);
+        }
+        return element;
+    }
+
+    document.querySelectorAll('.user-list[data-url]').forEach(list => {
+        const kind = list.getAttribute('data-kind');
+        const url = list.getAttribute('data-url');
+        const search = document.getElementById(`${kind}Search`);
+        let next = list.getAttribute('data-next');
+        let query = '';
+        let loading = false;
+        let request = 0;
+
+        // Fetch the slice after `next` and append it (or replace the list for a new search)
+        function loadSlice(replace) {
+            if (loading && !replace) return;
+            const params = new URLSearchParams();
+            if (!replace && next) params.set('after', next);
+            if (query) params.set('q', query);
+
+            loading = true;
+            const current = ++request;
+            fetch(`${url}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    // A newer search has been started meanwhile
+                    if (current !== request) return;
+                    if (replace) list.innerHTML = '';
+                    data.items.forEach(item => list.appendChild(renderItem(item, kind)));
+                    next = data.next ? String(data.next) : '';
+                    loading = false;
+                    // Keep loading while the list does not fill its scroll area
+                    if (next && list.scrollHeight <= list.clientHeight) loadSlice(false);
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    loading = false;
+                });
+        }
+
+        // Load the next slice when the list is scrolled close to its end
+        list.addEventListener('scroll', function() {
+            if (next && list.scrollTop + list.clientHeight >= list.scrollHeight - 100) {
+                loadSlice(false);
+            }
+        });
+
+        // Search on the server after the user stops typing
+        if (search) {
+            let timer = null;
+            search.addEventListener('input', function() {
+                clearTimeout(timer);
+                timer = setTimeout(() => {
+                    query = this.value.trim();
+                    loadSlice(true);
+                }, 300);
+            });
+        }
+    });
+});
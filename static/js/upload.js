@@ -9,29 +9,32 @@ document.addEventListener('DOMContentLoaded', function() {
     if (uploadForm && fileInput && uploadBtn) {
         // Add file validation
         fileInput.addEventListener('change', function() {
-            const file = this.files[0];
-            if (file) {
-                const fileName = file.name;
-                const fileExtension = fileName.split('.').pop().toLowerCase();
-                
-                // Check file extension
-                const allowedExtensions = ['html', 'pdf', 'txt'];
-                if (!allowedExtensions.includes(fileExtension)) {
-                    alert('Недопустимый тип файла. Разрешены только HTML, PDF и TXT файлы.');
-                    this.value = ''; // Clear the file input
-                    return;
-                }
-                
-                // Check file size (max 10MB)
+            const files = Array.from(this.files);
+            if (files.length > 0) {
+                const allowedExtensions = ['html', 'pdf', 'txt', 'zip'];
                 const maxSize = 10 * 1024 * 1024; // 10MB in bytes
-                if (file.size > maxSize) {
-                    alert('Размер файла слишком большой. Максимальный размер: 10MB.');
-                    this.value = ''; // Clear the file input
-                    return;
+                
+                for (const file of files) {
+                    const fileExtension = file.name.split('.').pop().toLowerCase();
+                    
+                    // Check file extension; a ZIP archive is uploaded on its own
+                    if (!allowedExtensions.includes(fileExtension) || (fileExtension === 'zip' && files.length > 1)) {
+                        alert('Недопустимый тип файла. Разрешены HTML, PDF и TXT файлы или один ZIP-архив с ними.');
+                        this.value = ''; // Clear the file input
+                        return;
+                    }
+                    
+                    // Check file size (max 10MB)
+                    if (file.size > maxSize) {
+                        alert(`Размер файла ${file.name} слишком большой. Максимальный размер: 10MB.`);
+                        this.value = ''; // Clear the file input
+                        return;
+                    }
                 }
                 
                 // Update button text
-                uploadBtn.innerHTML = `<i class="fas fa-upload me-2"></i> Загрузить ${fileName}`;
+                const label = files.length === 1 ? files[0].name : `${files.length} файлов`;
+                uploadBtn.innerHTML = `<i class="fas fa-upload me-2"></i> Загрузить ${label}`;
             } else {
                 // Reset button text if no file selected
                 uploadBtn.innerHTML = `<i class="fas fa-upload me-2"></i> Загрузить и обработать`;
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The database is chosen when app is first imported, so it is set before
+# any test module imports it
+DB_DIR = tempfile.mkdtemp(prefix='vk_parser_test_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
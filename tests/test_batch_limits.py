@@ -0,0 +1,65 @@
+"""ZIP batches beyond the member count or uncompressed size limits are rejected."""
+import io
+import zipfile
+
+import pytest
+
+from app import app
+import utils.file_processor as file_processor
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return str(path)
+
+def test_batch_within_limits_is_parsed(tmp_path):
+    path = write_zip(tmp_path / 'batch.zip', [
+        ('a.txt', "https://vk.com/wall-1_1 27.03.2024 08:53\n"),
+        ('b.html', '<a href="https://vk.com/wall-1_2">post</a>'),
+        ('__MACOSX/._a.txt', "ignored")
+    ])
+    file_processor.check_zip_batch(path)
+    links = file_processor.parse_zip_file(path, workers=1)[0]
+    assert links == ["https://vk.com/wall-1_1", "https://vk.com/wall-1_2"]
+
+def test_uncompressed_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_processor, 'BATCH_MAX_UNCOMPRESSED_BYTES', 1024 * 1024)
+    # 4 MB of zeros compress to a few KB
+    path = write_zip(tmp_path / 'bomb.zip', [('bomb.txt', b'\0' * 4 * 1024 * 1024)])
+
+    with pytest.raises(ValueError, match='после распаковки'):
+        file_processor.check_zip_batch(path)
+    with pytest.raises(ValueError, match='после распаковки'):
+        file_processor.parse_zip_file(path, workers=1)
+
+def test_member_count_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_processor, 'BATCH_MAX_MEMBERS', 3)
+    path = write_zip(tmp_path / 'many.zip', [(f"{i}.txt", "") for i in range(4)])
+
+    with pytest.raises(ValueError, match='не больше 3'):
+        file_processor.check_zip_batch(path)
+
+def test_copy_stops_at_limit():
+    target = io.BytesIO()
+    with pytest.raises(ValueError):
+        file_processor._copy_member(io.BytesIO(b'x' * 100), target, 10)
+    assert target.getvalue() == b''
+
+def test_upload_of_oversized_batch_is_rejected(tmp_path, monkeypatch):
+    from models import File
+
+    monkeypatch.setattr(file_processor, 'BATCH_MAX_UNCOMPRESSED_BYTES', 1024 * 1024)
+    monkeypatch.setattr('app.UPLOAD_DIR', str(tmp_path))
+    data = open(write_zip(tmp_path / 'bomb.zip', [('bomb.txt', b'\0' * 4 * 1024 * 1024)]), 'rb').read()
+    with app.app_context():
+        files_before = File.query.count()
+
+    response = app.test_client().post('/upload', data={'file': (io.BytesIO(data), 'bomb.zip')},
+                                      content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    assert response.location.endswith('/upload')
+    with app.app_context():
+        assert File.query.count() == files_before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['bomb.zip']
@@ -0,0 +1,60 @@
+"""/api/posts/bulk: JSON and NDJSON bodies."""
+import json
+
+import config
+from app import app
+import utils.file_processor as file_processor
+
+NDJSON = 'application/x-ndjson'
+
+def ndjson(items):
+    return ''.join(json.dumps(item) + '\n' for item in items)
+
+def test_json_and_ndjson_answer_alike():
+    client = app.test_client()
+    items = [{'link': "https://vk.com/wall-11_1", 'publish_time': "2024-03-27T08:53"}, "not a link"]
+
+    response = client.post('/api/posts/bulk', json=items)
+    assert response.status_code == 201
+    assert [sorted(result) for result in response.get_json()['results']] == [['id', 'link'], ['error', 'link']]
+
+    response = client.post('/api/posts/bulk', data=ndjson(items), content_type=NDJSON)
+    assert response.status_code == 201
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [sorted(line) for line in lines] == [['id', 'link'], ['error', 'link']]
+
+def test_json_body_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(config, 'BULK_JSON_MAX_BYTES', 100)
+    items = [f"https://vk.com/wall-11_{i}" for i in range(10)]
+
+    response = app.test_client().post('/api/posts/bulk', json=items)
+
+    assert response.status_code == 413
+    assert 'NDJSON' in response.get_json()['message']
+
+def test_ndjson_database_error_ends_with_error_line(monkeypatch):
+    calls = []
+    insert_post_rows = file_processor.insert_post_rows
+
+    def failing_insert(db, rows):
+        calls.append(len(rows))
+        if len(calls) > 1:
+            raise RuntimeError("database is locked")
+        return insert_post_rows(db, rows)
+
+    monkeypatch.setattr(file_processor, 'insert_post_rows', failing_insert)
+    items = [{'link': f"https://vk.com/wall-12_{i}", 'publish_time': "2024-03-27T08:53"} for i in range(3)]
+
+    ingest_post_items = file_processor.ingest_post_items
+    # Two items per chunk: the first chunk is committed, the second fails
+    monkeypatch.setattr('app.ingest_post_items', lambda items, app, default_parse_option: ingest_post_items(
+        items, app, default_parse_option, chunk_size=2
+    ))
+    response = app.test_client().post('/api/posts/bulk', data=ndjson(items), content_type=NDJSON)
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.get('link') for line in lines[:2]] == [items[0]['link'], items[1]['link']]
+    assert lines[-1] == {'error': "database is locked"}
+    with app.app_context():
+        from models import Post
+        assert Post.query.filter(Post.link.like("https://vk.com/wall-12_%")).count() == 2
@@ -0,0 +1,70 @@
+"""Export downloads through /results/<id>/export, streamed and cached."""
+from datetime import datetime
+
+import pytest
+
+from app import app, db
+import utils.export as export
+import utils.file_processor as file_processor
+
+@pytest.fixture
+def result_id(tmp_path, monkeypatch):
+    """A parse result with activity; exports are cached in a temporary directory"""
+    from models import Post, ParseResult
+    from utils.activity import store_activity
+
+    monkeypatch.setattr(export, 'RESULTS_DIR', str(tmp_path))
+    monkeypatch.setattr(file_processor, 'RESULTS_DIR', str(tmp_path))
+    with app.app_context():
+        post = Post(link="https://vk.com/wall-7_7", publish_time=datetime(2024, 3, 27, 8, 53),
+                    parse_time=datetime(2024, 3, 28, 8, 43), status='completed')
+        db.session.add(post)
+        db.session.flush()
+        result = ParseResult(post_id=post.id, likes_count=2, comments_count=1, reposts_count=0)
+        db.session.add(result)
+        db.session.flush()
+        store_activity(db, result.id, {
+            'likes': [{'id': 1, 'name': "Иван Петров"}, {'id': 2, 'name': "Анна Смирнова"}],
+            'comments': [{'id': 3, 'name': "Олег Иванов", 'text': "Отличный пост"}],
+            'reposts': []
+        })
+        db.session.commit()
+        return result.id
+
+def set_export_format(value):
+    from models import Settings
+
+    with app.app_context():
+        Settings.query.filter_by(key='export_format').first().value = value
+        db.session.commit()
+
+def test_txt_export_streams_end_to_end(result_id):
+    set_export_format('txt')
+    response = app.test_client().get(f"/results/{result_id}/export")
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert "Ссылка на пост: https://vk.com/wall-7_7" in body
+    assert "ЛАЙКИ (2):\n1. Иван Петров - https://vk.com/id1\n2. Анна Смирнова - https://vk.com/id2\n" in body
+    assert "1. Олег Иванов - https://vk.com/id3\n   Комментарий: Отличный пост\n" in body
+    assert body.endswith("РЕПОСТЫ (0):\n")
+
+def test_cached_export_carries_etag(result_id):
+    set_export_format('csv')
+    client = app.test_client()
+
+    first = client.get(f"/results/{result_id}/export")
+    assert first.status_code == 200
+    # The first download is streamed: its hash is only known at the end,
+    # and the export is cached once the body has been read
+    assert 'ETag' not in first.headers
+    body = first.data
+
+    second = client.get(f"/results/{result_id}/export")
+    assert second.status_code == 200
+    assert second.data == body
+    etag = second.headers['ETag']
+
+    revalidated = client.get(f"/results/{result_id}/export", headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
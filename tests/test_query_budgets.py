@@ -0,0 +1,77 @@
+"""Every view in QUERY_BUDGETS stays within its SQL query budget.
+
+utils.query_stats reports the statements of every request in the
+X-DB-Queries header; an N+1 regression fails the comparison with the
+budget here. Several rows are seeded so that per-row queries would show.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app import app, db
+from config import QUERY_BUDGETS, get_now_moscow
+
+ROWS = 5
+
+@pytest.fixture(scope='module')
+def seeded():
+    """Files with pending and completed posts, results and activity; returns the ids to request"""
+    from models import File, Post, ParseResult
+    from utils.activity import store_activity
+
+    now = get_now_moscow().replace(tzinfo=None)
+    with app.app_context():
+        file_ids, result_ids = [], []
+        for i in range(ROWS):
+            file = File(filename=f"report_{i}.html", file_path=f"uploads/report_{i}.html", file_type='html',
+                        status='processed', links_found=2, posts_created=2)
+            db.session.add(file)
+            db.session.flush()
+            file_ids.append(file.id)
+
+            # Ожидающий пост далеко в будущем, чтобы планировщик его не трогал
+            db.session.add(Post(link=f"https://vk.com/wall-1_{i}", file_id=file.id, publish_time=now,
+                                parse_time=now + timedelta(days=30)))
+            done = Post(link=f"https://vk.com/wall-2_{i}", file_id=file.id, publish_time=now - timedelta(days=1),
+                        parse_time=now - timedelta(hours=1), status='completed')
+            db.session.add(done)
+            db.session.flush()
+
+            result = ParseResult(post_id=done.id, likes_count=3, comments_count=2, reposts_count=1)
+            db.session.add(result)
+            db.session.flush()
+            result_ids.append(result.id)
+            store_activity(db, result.id, {
+                'likes': [{'id': 100 + n, 'name': f"User {n}"} for n in range(3)],
+                'comments': [{'id': 200 + n, 'name': f"Commenter {n}", 'text': f"comment {n}"} for n in range(2)],
+                'reposts': [{'id': 300, 'name': "Reposter"}]
+            })
+        db.session.commit()
+
+    return {'file_id': file_ids[0], 'result_id': result_ids[0]}
+
+def view_urls(ids):
+    return {
+        'index': '/',
+        'archive': '/archive',
+        'results': '/results',
+        'scheduled': '/scheduled',
+        'file_detail': f"/archive/file/{ids['file_id']}",
+        'result_detail': f"/results/{ids['result_id']}",
+        'api_result_activity': f"/api/results/{ids['result_id']}/activity/comments",
+        'api_files': '/api/files',
+        'api_results': '/api/results',
+        'api_scheduled': '/api/scheduled'
+    }
+
+def test_every_budgeted_view_is_covered(seeded):
+    assert set(view_urls(seeded)) == set(QUERY_BUDGETS)
+
+@pytest.mark.parametrize('endpoint', sorted(QUERY_BUDGETS))
+def test_view_within_query_budget(seeded, endpoint):
+    client = app.test_client()
+    response = client.get(view_urls(seeded)[endpoint])
+
+    assert response.status_code == 200
+    queries = int(response.headers['X-DB-Queries'])
+    assert queries <= QUERY_BUDGETS[endpoint], f"{endpoint} ran {queries} SQL queries, budget is {QUERY_BUDGETS[endpoint]}"
@@ -0,0 +1,24 @@
+"""Names resolved through the vk_user directory."""
+from sqlalchemy import text
+
+from app import app, db
+import utils.vk_parser as vk_parser
+
+def test_concurrently_stored_user_is_updated(monkeypatch):
+    """A user inserted by another parse between the lookup and the insert does not conflict"""
+    from models import VKUser
+
+    def users_get(method, params, token=None):
+        # Another parse stores the same user in the meantime
+        with db.engine.begin() as connection:
+            connection.execute(text("INSERT INTO vk_user (id, first_name, last_name) VALUES (9001, 'Old', 'Name')"))
+        return {'response': [{'id': 9001, 'first_name': "Иван", 'last_name': "Петров"},
+                             {'id': 9002, 'first_name': "Анна", 'last_name': "Смирнова"}]}
+
+    monkeypatch.setattr(vk_parser, 'make_vk_api_request', users_get)
+    with app.app_context():
+        names = vk_parser.resolve_user_names([9001, 9002, -5], 'token')
+
+        assert names == {9001: "Иван Петров", 9002: "Анна Смирнова"}
+        assert db.session.get(VKUser, 9001).full_name == "Иван Петров"
+        assert db.session.get(VKUser, 9002).fetched_at is not None
@@ -0,0 +1,179 @@
+from sqlalchemy import insert, update
+
+# Import config
+from config import logger, ACTIVITY_PAGE_SIZE
+
+# Activity lists of a parse result, in the order they are stored and shown
+ACTIVITY_KINDS = ('likes', 'comments', 'reposts')
+
+def activity_search_text(name, text=None):
+    """Lower-cased name and comment text that activity search matches"""
+    return ' '.join(part for part in (name, text) if part).lower() or None
+
+def store_activity(db, result_id, activity):
+    """Insert the activity lists of a parse result as activity_item rows.
+
+    activity maps kinds from ACTIVITY_KINDS to lists of {"id", "name"} dicts,
+    comments also have "text". Positions start at 1 in list order.
+    """
+    from models import ActivityItem
+
+    rows = [
+        {
+            'result_id': result_id,
+            'kind': kind,
+            'position': position,
+            'user_id': item.get('id'),
+            'name': item.get('name'),
+            'text': item.get('text'),
+            'search_text': activity_search_text(item.get('name'), item.get('text'))
+        }
+        for kind in ACTIVITY_KINDS
+        for position, item in enumerate(activity.get(kind) or [], 1)
+    ]
+    if rows:
+        db.session.execute(insert(ActivityItem), rows, execution_options={'render_nulls': True})
+    return len(rows)
+
+def fill_activity_names(db, rows, token=None):
+    """Resolve names of activity rows stored without them (fast parse mode) and save them.
+
+    Returns the resolved names by user id.
+    """
+    from models import ActivityItem
+    from utils.vk_parser import resolve_user_names
+
+    missing = [row for row in rows if not row.name]
+    if not missing:
+        return {}
+
+    names = resolve_user_names([row.user_id for row in missing], token)
+    updates = [
+        {'id': row.id, 'name': names[row.user_id], 'search_text': activity_search_text(names[row.user_id], row.text)}
+        for row in missing if names.get(row.user_id)
+    ]
+    if updates:
+        db.session.execute(update(ActivityItem), updates)
+        db.session.commit()
+    return names
+
+def has_unresolved_names(db, result_id):
+    """Whether any user in the result's activity lists still has no stored name.
+
+    Communities (negative ids) never get names and are not counted.
+    """
+    from models import ActivityItem
+
+    return db.session.query(ActivityItem.id).filter(
+        ActivityItem.result_id == result_id,
+        ActivityItem.name.is_(None),
+        ActivityItem.user_id > 0
+    ).first() is not None
+
+def activity_slice(db, result_id, kind, after=0, limit=ACTIVITY_PAGE_SIZE, search=None, token=None):
+    """Items of an activity list after position `after`, at most limit of them.
+
+    Only the returned rows are read. With search, only items whose name or
+    comment text contains it (case-insensitive) are returned; items whose
+    names are not resolved yet match on comment text only. Returns (items,
+    position to continue after, or None at the end of the list).
+    """
+    from models import ActivityItem
+
+    # Plain rows rather than ORM objects: exports read whole lists through here
+    query = db.session.query(
+        ActivityItem.id, ActivityItem.position, ActivityItem.user_id, ActivityItem.name, ActivityItem.text
+    ).filter(
+        ActivityItem.result_id == result_id,
+        ActivityItem.kind == kind,
+        ActivityItem.position > after
+    )
+    if search:
+        query = query.filter(ActivityItem.search_text.contains(search.lower(), autoescape=True))
+    rows = query.order_by(ActivityItem.position).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    names = fill_activity_names(db, rows, token)
+
+    items = []
+    for row in rows:
+        item = {'id': row.user_id, 'name': row.name or names.get(row.user_id) or f"User ID {row.user_id}"}
+        if kind == 'comments':
+            item['text'] = row.text
+        items.append(item)
+    return items, rows[-1].position if has_more else None
+
+def iter_activity(db, result_id, kind, token=None, batch_size=1000):
+    """All items of an activity list, read batch_size rows at a time"""
+    after = 0
+    while after is not None:
+        items, after = activity_slice(db, result_id, kind, after, batch_size, token=token)
+        yield from items
+
+def move_result_activity(db, result_id, likes_data, comments_data, reposts_data):
+    """Copy the activity JSON of one result parsed before activity_item existed into the table.
+
+    Returns False if another process copied it first (the unique index on
+    (result_id, kind, position) rejects the second copy).
+    """
+    import json
+    from sqlalchemy.exc import IntegrityError
+
+    try:
+        store_activity(db, result_id, {
+            'likes': json.loads(likes_data or '[]'),
+            'comments': json.loads(comments_data or '[]'),
+            'reposts': json.loads(reposts_data or '[]')
+        })
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def _legacy_activity_query(db):
+    """Results that have activity JSON but no activity_item rows yet"""
+    from sqlalchemy import or_
+    from models import ParseResult, ActivityItem
+
+    return db.session.query(
+        ParseResult.id, ParseResult.likes_data, ParseResult.comments_data, ParseResult.reposts_data
+    ).filter(
+        or_(ParseResult.likes_data.isnot(None), ParseResult.comments_data.isnot(None),
+            ParseResult.reposts_data.isnot(None)),
+        ~db.session.query(ActivityItem.id).filter(ActivityItem.result_id == ParseResult.id).exists()
+    )
+
+def ensure_result_activity(db, result_id):
+    """Move the activity JSON of one result on first access if it has not been moved yet"""
+    from models import ParseResult
+
+    row = _legacy_activity_query(db).filter(ParseResult.id == result_id).first()
+    if row:
+        move_result_activity(db, *row)
+
+def move_activity_blobs(db, batch_size=100):
+    """Copy activity JSON of all results parsed before activity_item existed into the table.
+
+    Run by `python db_migrate.py --move-activity`; results that are opened
+    before that are moved on access by ensure_result_activity. Each result
+    is committed separately and results already moved (also by another
+    process meanwhile) are skipped, so the run can be interrupted and
+    repeated. The JSON columns are left as they are.
+    """
+    from models import ParseResult
+
+    last_id = 0
+    moved = 0
+    while True:
+        batch = _legacy_activity_query(db).filter(ParseResult.id > last_id) \
+            .order_by(ParseResult.id).limit(batch_size).all()
+        if not batch:
+            break
+        for row in batch:
+            moved += move_result_activity(db, *row)
+        last_id = batch[-1].id
+
+    logger.info(f"Activity lists of {moved} parse results moved to activity_item")
+    return moved
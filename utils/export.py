@@ -0,0 +1,285 @@
+import csv
+import glob
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+import xlsxwriter
+
+# Import config
+from config import logger, EXPORT_CHUNK_ROWS, RESULTS_DIR, EXPORT_SCHEMA_VERSION, EXPORT_CACHE_MAX_BYTES
+from utils.activity import iter_activity, has_unresolved_names
+
+# CSV export columns and the type label of each activity kind
+CSV_HEADER = ['Тип', 'ID пользователя', 'Имя пользователя', 'Профиль ВК', 'Комментарий']
+CSV_KIND_LABELS = {'likes': 'Лайк', 'comments': 'Комментарий', 'reposts': 'Репост'}
+
+# Excel sheets: data columns of each activity kind
+EXCEL_SHEETS = {
+    'likes': ('Лайки', ['ID пользователя', 'Имя пользователя', 'Профиль ВК']),
+    'comments': ('Комментарии', ['ID пользователя', 'Имя пользователя', 'Комментарий', 'Профиль ВК']),
+    'reposts': ('Репосты', ['ID пользователя', 'Имя пользователя', 'Профиль ВК'])
+}
+
+# Rows per worksheet allowed by the xlsx format; longer lists continue on "Лайки (2)" etc.
+EXCEL_MAX_ROWS = 1048576
+# Hyperlinks per worksheet allowed by Excel; further profile links are written as text
+EXCEL_MAX_URLS = 65530
+
+# Cached exports in RESULTS_DIR: result_<id>_<format>_v<schema version>_<content hash>.<extension>.
+# The result_<id>_ prefix lets remove_stored_files delete them together with the result
+CACHED_EXPORT_RE = re.compile(r'^result_\d+_[a-z]+_v(\d+)_[0-9a-f]{16}\.\w+$')
+
+def profile_url(user_id):
+    return f"https://vk.com/id{user_id}"
+
+def result_info(result):
+    """Plain values of a parse result used by the exports.
+
+    They are read while the request's session is open: a streamed export
+    runs after the view has returned, when result is detached.
+    """
+    return {
+        'id': result.id,
+        'link': result.post.link,
+        'created_at': result.created_at_moscow.strftime('%d.%m.%Y %H:%M:%S'),
+        'likes_count': result.likes_count,
+        'comments_count': result.comments_count,
+        'reposts_count': result.reposts_count
+    }
+
+def _chunked(lines, size=EXPORT_CHUNK_ROWS):
+    """Join lines into strings of up to size lines each, so the response is not sent line by line"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+def generate_txt_export(db, info, token=None):
+    """Text export of a parse result (result_info), produced piece by piece while activity is read"""
+    # The header goes out before any activity is read
+    yield (
+        "Результаты парсинга поста ВКонтакте\n"
+        f"Ссылка на пост: {info['link']}\n"
+        f"Время парсинга: {info['created_at']} (МСК)\n\n"
+    )
+
+    def lines():
+        sections = (
+            ('likes', f"ЛАЙКИ ({info['likes_count']}):\n"),
+            ('comments', f"КОММЕНТАРИИ ({info['comments_count']}):\n"),
+            ('reposts', f"РЕПОСТЫ ({info['reposts_count']}):\n")
+        )
+        for index, (kind, title) in enumerate(sections):
+            if index:
+                yield "\n"
+            yield title
+            for i, user in enumerate(iter_activity(db, info['id'], kind, token), 1):
+                yield f"{i}. {user.get('name', 'Неизвестно')} - {profile_url(user.get('id', ''))}\n"
+                if user.get('text'):
+                    yield f"   Комментарий: {user['text']}\n"
+
+    yield from _chunked(lines())
+
+def generate_csv_export(db, info, token=None):
+    """CSV export of a parse result (result_info), one row per activity item, produced piece by piece"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def row(values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    def lines():
+        for kind, label in CSV_KIND_LABELS.items():
+            for user in iter_activity(db, info['id'], kind, token):
+                user_id = user.get('id', '')
+                yield row([label, user_id, user.get('name', 'Неизвестно'), profile_url(user_id),
+                           user.get('text') or ''])
+
+    # UTF-8 BOM so that Excel detects the encoding
+    yield '\ufeff' + row(CSV_HEADER)
+    yield from _chunked(lines())
+
+def write_excel_export(db, info, path, token=None):
+    """Excel export of a parse result (result_info) written to path.
+
+    The workbook is written in xlsxwriter's constant_memory mode: each row
+    is flushed to disk as soon as it is complete, so memory does not grow
+    with the activity lists. A list longer than a worksheet allows is
+    continued on further sheets. Profile links are clickable up to Excel's
+    limit of hyperlinks per sheet and plain text after it.
+    """
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+
+    def add_sheet(name, columns):
+        worksheet = workbook.add_worksheet(name)
+        for column, title in enumerate(columns):
+            worksheet.write_string(0, column, title, header_format)
+        return worksheet
+
+    info_sheet = add_sheet('Информация', ['Параметр', 'Значение'])
+    info_rows = [
+        ('Ссылка на пост', info['link']),
+        ('Время парсинга', f"{info['created_at']} (МСК)"),
+        ('Количество лайков', info['likes_count']),
+        ('Количество комментариев', info['comments_count']),
+        ('Количество репостов', info['reposts_count'])
+    ]
+    for row, (name, value) in enumerate(info_rows, 1):
+        info_sheet.write_string(row, 0, name)
+        info_sheet.write(row, 1, value)
+
+    for kind, (title, columns) in EXCEL_SHEETS.items():
+        # A sheet is only added once its list turns out to be non-empty
+        worksheet, sheets, row = None, 0, EXCEL_MAX_ROWS
+        for user in iter_activity(db, info['id'], kind, token):
+            if row >= EXCEL_MAX_ROWS:
+                sheets += 1
+                worksheet = add_sheet(title if sheets == 1 else f"{title} ({sheets})", columns)
+                row = 1
+                urls = 0
+
+            values = {
+                'ID пользователя': user.get('id', ''),
+                'Имя пользователя': user.get('name', 'Неизвестно'),
+                'Комментарий': user.get('text') or '',
+                'Профиль ВК': profile_url(user.get('id', ''))
+            }
+            for column, name in enumerate(columns):
+                value = values[name]
+                if name == 'Профиль ВК' and urls < EXCEL_MAX_URLS:
+                    worksheet.write_url(row, column, value, string=value)
+                    urls += 1
+                elif isinstance(value, int):
+                    worksheet.write_number(row, column, value)
+                elif value:
+                    worksheet.write_string(row, column, value)
+            row += 1
+
+    workbook.close()
+
+def cached_export(result_id, export_format):
+    """(path, content hash) of the cached export of a result, None if there is none.
+
+    A hit refreshes the file's modification time, which eviction treats as
+    the last access.
+    """
+    prefix = f"result_{result_id}_{export_format}_v{EXPORT_SCHEMA_VERSION}_"
+    for path in glob.glob(os.path.join(glob.escape(str(RESULTS_DIR)), prefix + '*')):
+        name = os.path.basename(path)
+        if not CACHED_EXPORT_RE.match(name):
+            continue
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted meanwhile
+            continue
+        return path, name[len(prefix):].split('.', 1)[0]
+    return None
+
+def store_cached_export(db, tmp_path, content_hash, result_id, export_format, extension):
+    """Move a finished export into the cache, returns its path.
+
+    Exports that still show user ids instead of names (no VK token, failed
+    users.get) are not cached, so the next download tries again; None is
+    returned for them and tmp_path is left in place.
+    """
+    if has_unresolved_names(db, result_id):
+        return None
+
+    path = os.path.join(RESULTS_DIR, f"result_{result_id}_{export_format}_v{EXPORT_SCHEMA_VERSION}_{content_hash}.{extension}")
+    os.replace(tmp_path, path)
+    evict_cached_exports(keep=path)
+    return path
+
+def cache_stream(db, chunks, result_id, export_format, extension):
+    """Pass the chunks of a streamed export through while saving them to the cache.
+
+    A download that is not completed leaves nothing behind. The content hash
+    is only known after the last chunk, so the streamed response itself has
+    no ETag; later downloads of the cached file have one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=RESULTS_DIR, prefix='.export_')
+    digest = hashlib.sha256()
+    cached = False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                f.write(data)
+                digest.update(data)
+                yield data
+        cached = store_cached_export(db, tmp_path, digest.hexdigest()[:16], result_id, export_format, extension) is not None
+    finally:
+        if not cached:
+            os.remove(tmp_path)
+
+def build_cached_excel_export(db, info, token=None):
+    """Write the Excel export of a result into the cache.
+
+    Returns (path, content hash); an export that is not cached is returned
+    as an open file that is already unlinked from disk.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=RESULTS_DIR, prefix='.export_')
+    os.close(fd)
+    try:
+        write_excel_export(db, info, tmp_path, token)
+        digest = hashlib.sha256()
+        with open(tmp_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()[:16]
+
+        path = store_cached_export(db, tmp_path, content_hash, info['id'], 'excel', 'xlsx')
+        if path:
+            return path, content_hash
+        f = open(tmp_path, 'rb')
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return f, content_hash
+
+def evict_cached_exports(max_bytes=EXPORT_CACHE_MAX_BYTES, keep=None):
+    """Delete cached exports of older schema versions, then the least recently
+    downloaded ones until the cache fits in max_bytes"""
+    entries = []
+    for entry in os.scandir(RESULTS_DIR):
+        match = CACHED_EXPORT_RE.match(entry.name)
+        if not match:
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if int(match.group(1)) != EXPORT_SCHEMA_VERSION:
+            entries.append((0, 0, entry.path))
+        else:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if mtime and total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info(f"Evicted {removed} cached exports, {total} bytes left in cache")
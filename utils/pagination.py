@@ -0,0 +1,110 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Import config
+from config import LISTING_COUNT_TTL
+
+# Cached listing totals: key -> (value, expires at by time.monotonic)
+_count_cache = {}
+_count_lock = threading.Lock()
+
+class KeysetPage:
+    """One page of a keyset-paginated listing.
+
+    Keeps the attributes templates used on Flask-SQLAlchemy's Pagination
+    (items, has_prev, has_next, total); neighbouring pages are addressed by
+    opaque cursors instead of page numbers.
+    """
+
+    def __init__(self, items, has_prev, has_next, prev_cursor, next_cursor, total):
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.total = total
+
+def encode_cursor(value, item_id):
+    """URL-safe token for the (sort value, id) position of a row"""
+    payload = json.dumps([value.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """(sort value, id) of a cursor token, None for a missing or malformed token"""
+    if not token:
+        return None
+    try:
+        value, item_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return datetime.fromisoformat(value), int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+def keyset_paginate(query, sort_column, id_column, per_page, after=None, before=None, descending=True, total=None):
+    """Page of query ordered by (sort_column, id_column) following or preceding a cursor.
+
+    Rows past the cursor are selected with a row-value comparison that the
+    sort index answers directly, so a deep page costs the same as the first
+    one, unlike OFFSET. Without a valid cursor the first page is returned.
+    """
+    key = tuple_(sort_column, id_column)
+    after_key = decode_cursor(after)
+    before_key = None if after_key else decode_cursor(before)
+
+    if descending:
+        forward = (sort_column.desc(), id_column.desc())
+        backward = (sort_column.asc(), id_column.asc())
+    else:
+        forward = (sort_column.asc(), id_column.asc())
+        backward = (sort_column.desc(), id_column.desc())
+
+    if before_key:
+        # Previous page: walk the index backwards from the cursor, then restore the order
+        rows = query.filter(key > before_key if descending else key < before_key) \
+            .order_by(*backward).limit(per_page + 1).all()
+        if len(rows) < per_page:
+            # Reached the start of the listing: show a full first page
+            return keyset_paginate(query, sort_column, id_column, per_page, descending=descending, total=total)
+        has_prev = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after_key:
+            query = query.filter(key < after_key if descending else key > after_key)
+        rows = query.order_by(*forward).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after_key is not None
+
+    def cursor(item):
+        return encode_cursor(getattr(item, sort_column.key), getattr(item, id_column.key))
+
+    return KeysetPage(
+        items,
+        has_prev=has_prev and bool(items),
+        has_next=has_next and bool(items),
+        prev_cursor=cursor(items[0]) if has_prev and items else None,
+        next_cursor=cursor(items[-1]) if has_next and items else None,
+        total=total
+    )
+
+def cached_count(key, query, ttl=LISTING_COUNT_TTL):
+    """query.count() cached in the process for ttl seconds under key.
+
+    Listing totals are only shown as a hint, so a slightly stale value
+    saves a full COUNT on every page.
+    """
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(key)
+        if entry and now < entry[1]:
+            return entry[0]
+
+    value = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[key] = (value, now + ttl)
+    return value
@@ -0,0 +1,51 @@
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Import config
+from config import logger, QUERY_BUDGETS
+
+def initialize_query_stats(app):
+    """Count SQL statements and database time of every request.
+
+    The totals are sent in the X-DB-Queries and Server-Timing response
+    headers and logged. A view listed in QUERY_BUDGETS that runs more
+    statements than its budget logs a warning; tests/test_query_budgets.py
+    checks the X-DB-Queries header against the budgets.
+    """
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.sql_queries = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def report_query_stats(response):
+        if 'sql_queries' not in g:
+            return response
+
+        queries, db_ms = g.sql_queries, g.sql_time * 1000
+        response.headers['X-DB-Queries'] = str(queries)
+        response.headers['Server-Timing'] = f'db;dur={db_ms:.1f};desc="{queries} queries"'
+        if request.endpoint != 'static':
+            logger.debug(f"{request.method} {request.path}: {queries} SQL queries, {db_ms:.1f} ms")
+
+        budget = QUERY_BUDGETS.get(request.endpoint)
+        if budget is not None and queries > budget:
+            logger.warning(f"View {request.endpoint} ran {queries} SQL queries, budget is {budget}")
+        return response
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and conn.info.get('query_start_time'):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        if 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_time += elapsed
@@ -111,6 +111,39 @@ def schedule_post_parsing(post_id, app):
                 # For times more than a day in the future, we'll rely on the periodic check
                 logger.info(f"Post {post_id} will be checked periodically until parse time {post.parse_time}")
 
+def schedule_posts_bulk(post_times, app):
+    """Schedule parsing of newly created posts from (post_id, parse_time) pairs.
+
+    Unlike schedule_post_parsing no Post rows are loaded: the caller has just
+    inserted them as pending. Posts that are already due run on the
+    scheduler thread a second later instead of being parsed inline.
+    """
+    from config import get_now_moscow
+
+    now = get_now_moscow().replace(tzinfo=None)  # Убираем tzinfo для совместимости с БД
+    scheduled = 0
+    for post_id, parse_time in post_times:
+        seconds_until_parse = max((parse_time - now).total_seconds(), 1)
+        if seconds_until_parse >= 86400:
+            # For times more than a day in the future, we'll rely on the periodic check
+            continue
+
+        if post_id in jobs:
+            schedule.cancel_job(jobs[post_id])
+        jobs[post_id] = schedule.every(seconds_until_parse).seconds.do(
+            parse_with_context, post_id, app
+        ).tag(f"post_{post_id}")
+        scheduled += 1
+
+    logger.info(f"Scheduled parsing for {scheduled} posts, {len(post_times) - scheduled} left to the periodic check")
+
+def unschedule_posts(post_ids):
+    """Cancel scheduled parsing of deleted posts"""
+    for post_id in post_ids:
+        job = jobs.pop(post_id, None)
+        if job:
+            schedule.cancel_job(job)
+
 def parse_with_context(post_id, app):
     """Parse post with application context"""
     try:
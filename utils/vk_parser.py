@@ -3,11 +3,14 @@ import json
 import logging
 import re
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 
 # Import config
-from config import logger, VK_TOKEN
+from config import logger, VK_TOKEN, VK_API_RATE_LIMIT, VK_API_MAX_WORKERS, VK_WALL_GET_BY_ID_BATCH
 
 # VK API error class
 class VKAPIError(Exception):
@@ -34,7 +37,7 @@ class VKAPICache:
                 return entry['data']
             else:
                 # Remove expired entry
-                del self.cache[cache_key]
+                self.cache.pop(cache_key, None)
                 logger.debug(f"Removed expired cache entry for key {cache_key}")
         return None
 
@@ -66,6 +69,119 @@ class VKAPICache:
 # Create cache instance
 vk_api_cache = VKAPICache()
 
+# Rate limiter
+class VKRateLimiter:
+    """Rate limiter shared by all threads making VK API requests"""
+    def __init__(self, rate=VK_API_RATE_LIMIT):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        """Block until the next request slot is available"""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+vk_rate_limiter = VKRateLimiter()
+
+# Parse metrics
+class ParseMetrics:
+    """Per-post counters of VK API traffic collected during parsing"""
+    def __init__(self, parse_mode=None):
+        self.parse_mode = parse_mode
+        self.api_calls = 0
+        self.cache_hits = 0
+        self.bytes_received = 0
+        self.decode_time = 0.0
+        self.completeness = {}
+        self.stages = {}
+        self.started_at = time.perf_counter()
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def record_request(self, size, decode_time):
+        """Account a single API response"""
+        with self.lock:
+            self.api_calls += 1
+            self.bytes_received += size
+            self.decode_time += decode_time
+
+    def record_cache_hit(self):
+        """Account a response served from cache"""
+        with self.lock:
+            self.cache_hits += 1
+
+    def record_stage(self, stage, seconds):
+        """Account time spent in an optional parse stage"""
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def record_completeness(self, kind, fetched, reported):
+        """Compare the number of fetched items with the count reported by VK"""
+        self.completeness[kind] = {'fetched': fetched, 'reported': reported}
+        if fetched < reported:
+            logger.info(f"Collected {fetched} of {reported} {kind}")
+
+    def finish(self):
+        """Fix total elapsed time"""
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        """Serializable representation for ParseResult.metrics_data"""
+        return {
+            'parse_mode': self.parse_mode,
+            'api_calls': self.api_calls,
+            'cache_hits': self.cache_hits,
+            'bytes_received': self.bytes_received,
+            'decode_ms': round(self.decode_time * 1000, 2),
+            'elapsed_ms': round(self.elapsed * 1000, 2),
+            'completeness': self.completeness,
+            'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        }
+
+_metrics_local = threading.local()
+
+def current_parse_metrics():
+    """Metrics collector of the parse running in this thread, if any"""
+    return getattr(_metrics_local, 'metrics', None)
+
+@contextmanager
+def collect_parse_metrics(parse_mode=None):
+    """Collect metrics of all VK API requests made inside the block"""
+    metrics = ParseMetrics(parse_mode)
+    previous = current_parse_metrics()
+    _metrics_local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        metrics.finish()
+        _metrics_local.metrics = previous
+
+def run_concurrently(func, args_list, max_workers=VK_API_MAX_WORKERS):
+    """Run func for every args tuple in a thread pool, preserving order.
+
+    Worker threads report to the parse metrics of the calling thread; request
+    rate is bounded by the shared vk_rate_limiter.
+    """
+    if not args_list:
+        return []
+
+    metrics = current_parse_metrics()
+
+    def worker(args):
+        _metrics_local.metrics = metrics
+        try:
+            return func(*args)
+        finally:
+            _metrics_local.metrics = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(worker, args_list))
+
 def get_vk_token(app):
     """Get VK API token from settings"""
     with app.app_context():
@@ -106,18 +222,26 @@ def extract_post_ids(link):
 
     return None, None, None
 
-def make_vk_api_request(method, params, token=None):
-    """Make a request to VK API"""
+def make_vk_api_request(method, params, token=None, use_cache=True):
+    """Make a request to VK API.
+
+    With use_cache=False the cached response is ignored and a fresh one is
+    requested (and cached).
+    """
     if not token:
         token = VK_TOKEN
 
     if not token:
         raise VKAPIError("VK API token not found", error_code=401)
 
+    metrics = current_parse_metrics()
+
     # Check cache
     cache_key = f"{method}_{json.dumps(params, sort_keys=True)}"
-    cached_result = vk_api_cache.get(cache_key)
+    cached_result = vk_api_cache.get(cache_key) if use_cache else None
     if cached_result:
+        if metrics is not None:
+            metrics.record_cache_hit()
         return cached_result
 
     # Add access token to params
@@ -125,10 +249,14 @@ def make_vk_api_request(method, params, token=None):
     params['v'] = '5.131'  # API version
 
     # Make request
+    vk_rate_limiter.wait()
     try:
         response = requests.get(f"https://api.vk.com/method/{method}", params=params)
         response.raise_for_status()
+        decode_started = time.perf_counter()
         data = response.json()
+        if metrics is not None:
+            metrics.record_request(len(response.content), time.perf_counter() - decode_started)
 
         if 'error' in data:
             raise VKAPIError(
@@ -165,24 +293,320 @@ def extract_post_timestamp(post_data):
 
     return None
 
-def parse_wall_post(owner_id, post_id, token=None):
-    """Parse a wall post to get likes, comments, and reposts"""
-    # Get post info
-    post_data = make_vk_api_request('wall.getById', {
-        'posts': f"{owner_id}_{post_id}",
-        'extended': 1
-    }, token)
+def apply_post_metadata(post, vk_post):
+    """Store publish time and counts from a wall.getById item on a Post row"""
+    publish_time = extract_post_timestamp(vk_post)
+    if publish_time and publish_time != post.publish_time:
+        post.publish_time = publish_time
+        logger.info(f"Обновлено время публикации для поста {post.id} на {publish_time} (МСК)")
+
+    for column, value in post_metadata_values(vk_post).items():
+        setattr(post, column, value)
+
+def post_metadata_values(vk_post):
+    """Post column values for the counts of a wall.getById item"""
+    from config import get_now_moscow
 
-    if not post_data.get('response') or not post_data['response'].get('items'):
-        raise VKAPIError("Post not found")
+    return {
+        'likes_count': vk_post.get('likes', {}).get('count', 0),
+        'comments_count': vk_post.get('comments', {}).get('count', 0),
+        'reposts_count': vk_post.get('reposts', {}).get('count', 0),
+        'meta_fetched_at': get_now_moscow().replace(tzinfo=None)
+    }
 
-    post = post_data['response']['items'][0]
+def wall_post_items(data):
+    """Items of a wall.getById response: a list, or {"items": [...]} with extended=1"""
+    response = data.get('response') or []
+    return response.get('items', []) if isinstance(response, dict) else response
 
-    # Get post timestamp if available
-    post_timestamp = extract_post_timestamp(post)
+def fetch_posts_by_ids(post_keys, token):
+    """Fetch wall posts by (owner_id, post_id) with batched wall.getById calls.
 
-    # Get likes
-    likes_data = []
+    Batches of VK_WALL_GET_BY_ID_BATCH posts are requested concurrently.
+    Returns {(owner_id, post_id): item}; posts of failed batches are missing.
+    """
+    def fetch_batch(batch):
+        try:
+            data = make_vk_api_request('wall.getById', {
+                'posts': ','.join(f"{owner_id}_{post_id}" for owner_id, post_id in batch)
+            }, token)
+        except Exception as e:
+            logger.error(f"Ошибка wall.getById для {len(batch)} постов: {e}")
+            return []
+        return wall_post_items(data)
+
+    batches = [
+        (post_keys[start:start + VK_WALL_GET_BY_ID_BATCH],)
+        for start in range(0, len(post_keys), VK_WALL_GET_BY_ID_BATCH)
+    ]
+    return {
+        (item.get('owner_id'), item.get('id')): item
+        for items in run_concurrently(fetch_batch, batches)
+        for item in items
+    }
+
+def stored_post_metadata(post):
+    """Build a wall.getById-like item from metadata stored on a Post row"""
+    return {
+        'id': post.item_id,
+        'owner_id': post.owner_id,
+        'likes': {'count': post.likes_count or 0},
+        'comments': {'count': post.comments_count or 0},
+        'reposts': {'count': post.reposts_count or 0}
+    }
+
+def resolve_user_names(user_ids, token=None):
+    """Resolve user names through the local vk_user directory.
+
+    Only ids that are unknown or older than VK_USER_TTL are requested from
+    users.get, in batches of VK_USERS_GET_BATCH. Must be called inside an
+    application context. Returns a dict {user_id: "First Last"}.
+    """
+    from models import VKUser, db
+    from config import VK_USER_TTL, VK_USERS_GET_BATCH, get_now_moscow
+
+    # Only positive ids are users, negative ids are communities
+    ids = list(dict.fromkeys(int(uid) for uid in user_ids if uid and int(uid) > 0))
+    if not ids:
+        return {}
+
+    now = get_now_moscow().replace(tzinfo=None)
+    known = {}
+    # Chunked IN queries to stay below SQLite's bound parameter limit
+    for i in range(0, len(ids), 500):
+        for user in VKUser.query.filter(VKUser.id.in_(ids[i:i + 500])).all():
+            known[user.id] = user
+
+    names = {}
+    stale_ids = []
+    for uid in ids:
+        user = known.get(uid)
+        if user and user.fetched_at and now - user.fetched_at < VK_USER_TTL:
+            names[uid] = user.full_name
+        else:
+            stale_ids.append(uid)
+
+    if not stale_ids:
+        return names
+
+    logger.debug(f"Resolving {len(stale_ids)} of {len(ids)} user names via users.get")
+    for i in range(0, len(stale_ids), VK_USERS_GET_BATCH):
+        chunk = stale_ids[i:i + VK_USERS_GET_BATCH]
+        try:
+            users_request = make_vk_api_request('users.get', {
+                'user_ids': ','.join(str(uid) for uid in chunk)
+            }, token)
+        except VKAPIError as e:
+            logger.error(f"Failed to get user info: {str(e)}")
+            # Fall back to whatever the directory already has
+            for uid in chunk:
+                if uid in known:
+                    names[uid] = known[uid].full_name
+            continue
+
+        rows = []
+        for profile in users_request.get('response') or []:
+            uid = profile.get('id')
+            if not uid:
+                continue
+            first_name, last_name = profile.get('first_name', ''), profile.get('last_name', '')
+            rows.append({'id': uid, 'first_name': first_name, 'last_name': last_name, 'fetched_at': now})
+            names[uid] = f"{first_name} {last_name}"
+        upsert_vk_users(db, rows)
+
+    db.session.commit()
+    return names
+
+def upsert_vk_users(db, rows):
+    """Insert or refresh vk_user rows with INSERT ... ON CONFLICT DO UPDATE.
+
+    Parses and result pages running at the same time may resolve the same
+    user; a plain INSERT would then fail on the primary key.
+    """
+    from models import VKUser
+
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    # 4 parameters per row: batches stay below SQLite's limit of 999
+    for i in range(0, len(rows), 200):
+        statement = insert(VKUser).values(rows[i:i + 200])
+        statement = statement.on_conflict_do_update(
+            index_elements=[VKUser.id],
+            set_={column: statement.excluded[column] for column in ('first_name', 'last_name', 'fetched_at')}
+        )
+        db.session.execute(statement)
+
+def get_parse_mode(file=None):
+    """Get parse mode of the file or the global one from settings"""
+    from models import Settings
+    from config import PARSE_MODE_FULL
+
+    if file is not None and file.parse_mode:
+        return file.parse_mode
+
+    setting = Settings.query.filter_by(key='parse_mode').first()
+    if setting and setting.value:
+        return setting.value
+    return PARSE_MODE_FULL
+
+def fetch_thread_comments(owner_id, post_id, threads, token=None):
+    """Fetch all replies of comment threads.
+
+    threads is a list of (comment_id, replies_count). Pages of replies are
+    requested in batches of up to 25 wall.getComments calls per execute, and
+    batches run concurrently under the shared rate limit. Returns a list of
+    (from_id, text) tuples.
+    """
+    calls = [
+        {
+            'owner_id': owner_id,
+            'post_id': post_id,
+            'comment_id': comment_id,
+            'count': 100,
+            'offset': offset
+        }
+        for comment_id, replies_count in threads
+        for offset in range(0, replies_count, 100)
+    ]
+
+    def run_batch(batch):
+        code = 'return [' + ','.join(
+            f"API.wall.getComments({json.dumps(call)})" for call in batch
+        ) + '];'
+        try:
+            response = make_vk_api_request('execute', {'code': code}, token)
+            return response.get('response') or []
+        except VKAPIError as e:
+            logger.error(f"Error getting comment threads with execute: {str(e)}")
+            # Fall back to separate requests for this batch
+            pages = []
+            for call in batch:
+                try:
+                    pages.append(make_vk_api_request('wall.getComments', dict(call), token).get('response'))
+                except VKAPIError as call_error:
+                    logger.error(f"Error getting comment thread {call['comment_id']}: {str(call_error)}")
+            return pages
+
+    batches = [(calls[i:i + 25],) for i in range(0, len(calls), 25)]
+    logger.info(f"Getting {len(threads)} comment threads for wall{owner_id}_{post_id} in {len(batches)} batches")
+
+    replies = []
+    for pages in run_concurrently(run_batch, batches):
+        for page in pages:
+            # execute returns false for calls that failed inside the batch
+            if not page:
+                continue
+            for reply in page.get('items') or []:
+                replies.append((reply.get('from_id'), reply.get('text', '')))
+    return replies
+
+def fetch_repost_ids(owner_id, post_id, reposts_count, token=None):
+    """Collect ids of all users and communities that reposted a wall post.
+
+    wall.getReposts is paged by offset, so all pages after the first are
+    fetched concurrently. If the method fails, newsfeed.search is walked with
+    start_from cursors instead. The number collected is compared with the
+    reposts count reported by VK.
+    """
+    def get_page(offset):
+        page = make_vk_api_request('wall.getReposts', {
+            'owner_id': owner_id,
+            'post_id': post_id,
+            'count': 1000,
+            'offset': offset
+        }, token)
+        return (page.get('response') or {}).get('items') or []
+
+    seen = set()
+    repost_ids = []
+
+    def add(from_id):
+        if from_id and from_id not in seen:
+            seen.add(from_id)
+            repost_ids.append(from_id)
+
+    try:
+        logger.info(f"Getting reposts data for wall{owner_id}_{post_id}")
+        pages = [get_page(0)]
+        if len(pages[0]) >= 1000:
+            pages.extend(run_concurrently(get_page, [
+                (offset,) for offset in range(1000, reposts_count, 1000)
+            ]))
+        for items in pages:
+            for item in items:
+                add(item.get('from_id'))
+    except VKAPIError as e:
+        logger.error(f"Error getting reposts with wall.getReposts: {str(e)}")
+
+        # Fallback to search method with cursor pagination
+        repost_query = f"wall{owner_id}_{post_id}"
+        start_from = None
+
+        while len(repost_ids) < reposts_count:
+            params = {
+                'q': repost_query,
+                'count': 200,
+                'extended': 0
+            }
+            if start_from:
+                params['start_from'] = start_from
+            try:
+                reposts_request = make_vk_api_request('newsfeed.search', params, token)
+            except VKAPIError as e:
+                # If we hit rate limits, stop here
+                logger.error(f"Error in newsfeed.search for reposts: {str(e)}")
+                if e.error_code in (6, 29):  # Rate limit errors
+                    break
+                raise
+
+            response = reposts_request.get('response') or {}
+            for item in response.get('items') or []:
+                for copy in item.get('copy_history') or []:
+                    if copy.get('owner_id') == owner_id and copy.get('id') == post_id:
+                        # This is a repost of our post
+                        add(item.get('from_id'))
+                        break
+
+            start_from = response.get('next_from')
+            if not start_from or not response.get('items'):
+                break
+
+    metrics = current_parse_metrics()
+    if metrics is not None:
+        metrics.record_completeness('reposts', len(repost_ids), reposts_count)
+    elif len(repost_ids) < reposts_count:
+        logger.info(f"Collected {len(repost_ids)} of {reposts_count} reposts for wall{owner_id}_{post_id}")
+
+    return repost_ids
+
+def parse_wall_post(owner_id, post_id, token=None, resolve_names=True, collect_threads=True,
+                    post=None):
+    """Parse a wall post to get likes, comments, and reposts.
+
+    With resolve_names=False only user ids are collected and names are left
+    empty; fill_activity_names fills them in the activity_item table when
+    the result is viewed or exported. With collect_threads replies inside
+    comment threads are collected as well. post is the
+    wall.getById item if the caller already has it.
+    """
+    if post is None:
+        # Get post info
+        post_data = make_vk_api_request('wall.getById', {
+            'posts': f"{owner_id}_{post_id}",
+            'extended': 1
+        }, token)
+
+        items = wall_post_items(post_data)
+        if not items:
+            raise VKAPIError("Post not found")
+
+        post = items[0]
+
+    # Get likes (ids only, names are resolved through the user directory)
+    like_ids = []
     likes_count = post.get('likes', {}).get('count', 0)
 
     if likes_count > 0:
@@ -194,143 +618,91 @@ def parse_wall_post(owner_id, post_id, token=None):
                 'item_id': post_id,
                 'count': 1000,
                 'offset': offset,
-                'extended': 1
+                'extended': 0
             }, token)
 
             if likes_request.get('response') and likes_request['response'].get('items'):
-                for user in likes_request['response']['items']:
-                    likes_data.append({
-                        'id': user.get('id'),
-                        'name': f"{user.get('first_name', '')} {user.get('last_name', '')}"
-                    })
+                like_ids.extend(likes_request['response']['items'])
 
             offset += 1000
 
     # Get comments
-    comments_data = []
+    comments = []
+    threads = []
     comments_count = post.get('comments', {}).get('count', 0)
 
     if comments_count > 0:
         offset = 0
         while offset < comments_count:
-            comments_request = make_vk_api_request('wall.getComments', {
+            params = {
                 'owner_id': owner_id,
                 'post_id': post_id,
                 'count': 100,
                 'offset': offset,
-                'extended': 1,
-                'fields': 'first_name,last_name'
-            }, token)
-
-            if comments_request.get('response') and comments_request['response'].get('items'):
-                for comment in comments_request['response']['items']:
-                    from_id = comment.get('from_id')
-                    # Find user in profiles
-                    user_name = "Unknown"
-                    for profile in comments_request['response'].get('profiles', []):
-                        if profile.get('id') == from_id:
-                            user_name = f"{profile.get('first_name', '')} {profile.get('last_name', '')}"
-                            break
-
-                    comments_data.append({
-                        'id': from_id,
-                        'name': user_name,
-                        'text': comment.get('text', '')
-                    })
+                'extended': 0
+            }
+            if collect_threads:
+                params['thread_items_count'] = 10
+            comments_request = make_vk_api_request('wall.getComments', params, token)
+
+            items = (comments_request.get('response') or {}).get('items')
+            if not items:
+                break
+
+            for comment in items:
+                comments.append((comment.get('from_id'), comment.get('text', '')))
+
+                thread = comment.get('thread') or {}
+                thread_items = thread.get('items') or []
+                if thread.get('count', 0) > len(thread_items):
+                    # Thread is longer than the preview, fetch it separately
+                    threads.append((comment.get('id'), thread['count']))
+                else:
+                    for reply in thread_items:
+                        comments.append((reply.get('from_id'), reply.get('text', '')))
 
             offset += 100
 
+        if threads:
+            threads_started = time.perf_counter()
+            comments.extend(fetch_thread_comments(owner_id, post_id, threads, token))
+            metrics = current_parse_metrics()
+            if metrics is not None:
+                metrics.record_stage('comment_threads', time.perf_counter() - threads_started)
+
+        metrics = current_parse_metrics()
+        if metrics is not None:
+            metrics.record_completeness('comments', len(comments), comments_count)
+
     # Get reposts
-    reposts_data = []
+    repost_ids = []
     reposts_count = post.get('reposts', {}).get('count', 0)
 
-    # For reposts, we can use a better API method
     if reposts_count > 0:
-        try:
-            # First try with the more direct method
-            logger.info(f"Getting reposts data for wall{owner_id}_{post_id}")
-            repost_request = make_vk_api_request('wall.getReposts', {
-                'owner_id': owner_id,
-                'post_id': post_id,
-                'count': 1000,
-                'offset': 0
-            }, token)
-
-            if repost_request.get('response') and repost_request['response'].get('items'):
-                for item in repost_request['response']['items']:
-                    from_id = item.get('from_id')
-                    if from_id:
-                        reposts_data.append({
-                            'id': from_id,
-                            'name': f"User ID {from_id}"  # Placeholder name
-                        })
-        except VKAPIError as e:
-            logger.error(f"Error getting reposts with wall.getReposts: {str(e)}")
-
-            # Fallback to search method
-            repost_query = f"wall{owner_id}_{post_id}"
-            offset = 0
-
-            while len(reposts_data) < reposts_count and offset < 1000:  # Limit to 1000 reposts
-                try:
-                    reposts_request = make_vk_api_request('newsfeed.search', {
-                        'q': repost_query,
-                        'count': 200,
-                        'offset': offset,
-                        'extended': 1
-                    }, token)
-
-                    if reposts_request.get('response') and reposts_request['response'].get('items'):
-                        for item in reposts_request['response']['items']:
-                            if 'copy_history' in item and item['copy_history']:
-                                for copy in item['copy_history']:
-                                    if (str(copy.get('owner_id')) == str(owner_id) and 
-                                        str(copy.get('id')) == str(post_id)):
-                                        # This is a repost of our post
-                                        from_id = item.get('from_id')
-                                        if from_id:
-                                            # Check if this repost is already in the list
-                                            if not any(r.get('id') == from_id for r in reposts_data):
-                                                reposts_data.append({
-                                                    'id': from_id,
-                                                    'name': f"User ID {from_id}"  # Placeholder name
-                                                })
-                                        break
-
-                    offset += 200
-                except VKAPIError as e:
-                    # If we hit rate limits, stop here
-                    logger.error(f"Error in newsfeed.search for reposts: {str(e)}")
-                    if e.error_code in (6, 29):  # Rate limit errors
-                        break
-                    raise
-
-    # Get user names for reposts if needed
-    if reposts_data:
-        user_ids = [str(user['id']) for user in reposts_data if isinstance(user['id'], (int, str))]
-        if user_ids:
-            # Split into chunks of 1000 to avoid API limits
-            for i in range(0, len(user_ids), 1000):
-                chunk = user_ids[i:i+1000]
-                try:
-                    logger.debug(f"Getting user info for repost users: {chunk}")
-                    users_request = make_vk_api_request('users.get', {
-                        'user_ids': ','.join(chunk),
-                        'fields': 'first_name,last_name'
-                    }, token)
-
-                    if users_request.get('response'):
-                        for user in users_request['response']:
-                            # Update name in reposts_data
-                            user_id = user.get('id')
-                            if user_id:
-                                for repost in reposts_data:
-                                    if str(repost['id']) == str(user_id):
-                                        repost['name'] = f"{user.get('first_name', '')} {user.get('last_name', '')}"
-                except VKAPIError as e:
-                    logger.error(f"Failed to get user info for reposts: {str(e)}")
-                    # If we can't get user info, continue with what we have
-                    pass
+        repost_ids = fetch_repost_ids(owner_id, post_id, reposts_count, token)
+
+    # Resolve all user names at once through the local directory
+    if resolve_names:
+        names = resolve_user_names(
+            like_ids + [from_id for from_id, _ in comments] + repost_ids, token
+        )
+        unknown_name = "Unknown"
+    else:
+        names = {}
+        unknown_name = None
+
+    likes_data = [
+        {'id': uid, 'name': names.get(uid, unknown_name)}
+        for uid in like_ids
+    ]
+    comments_data = [
+        {'id': from_id, 'name': names.get(from_id, unknown_name), 'text': text}
+        for from_id, text in comments
+    ]
+    reposts_data = [
+        {'id': uid, 'name': names.get(uid, f"User ID {uid}" if resolve_names else None)}
+        for uid in repost_ids
+    ]
 
     return {
         'likes': {
@@ -347,7 +719,7 @@ def parse_wall_post(owner_id, post_id, token=None):
         }
     }
 
-def parse_market_post(owner_id, post_id, token=None):
+def parse_market_post(owner_id, post_id, token=None, resolve_names=True):
     """Parse a market post to get likes, comments, and reposts"""
     # Market posts have a different API
     item_data = make_vk_api_request('market.getById', {
@@ -367,27 +739,22 @@ def parse_market_post(owner_id, post_id, token=None):
             'owner_id': owner_id,
             'item_id': post_id,
             'count': 100,
-            'extended': 1,
-            'fields': 'first_name,last_name'
+            'extended': 0
         }, token)
 
         if comments_request.get('response'):
             comments_count = comments_request['response'].get('count', 0)
-            if comments_request['response'].get('items'):
-                for comment in comments_request['response']['items']:
-                    from_id = comment.get('from_id')
-                    # Find user in profiles
-                    user_name = "Unknown"
-                    for profile in comments_request['response'].get('profiles', []):
-                        if profile.get('id') == from_id:
-                            user_name = f"{profile.get('first_name', '')} {profile.get('last_name', '')}"
-                            break
-
-                    comments_data.append({
-                        'id': from_id,
-                        'name': user_name,
-                        'text': comment.get('text', '')
-                    })
+            items = comments_request['response'].get('items') or []
+            names = {}
+            if resolve_names:
+                names = resolve_user_names([comment.get('from_id') for comment in items], token)
+            for comment in items:
+                from_id = comment.get('from_id')
+                comments_data.append({
+                    'id': from_id,
+                    'name': names.get(from_id, "Unknown" if resolve_names else None),
+                    'text': comment.get('text', '')
+                })
     except VKAPIError:
         # If we can't get comments, continue with empty list
         pass
@@ -456,7 +823,8 @@ def parse_adblogger_post(link, token=None):
 def parse_vk_post(post_id, app):
     """Parse a VK post from the database"""
     with app.app_context():
-        from models import Post, ParseResult
+        from models import Post, ParseResult, Settings
+        from utils.activity import store_activity, ACTIVITY_KINDS
 
         # Получаем экземпляр db через app.db
         db = app.db
@@ -470,50 +838,59 @@ def parse_vk_post(post_id, app):
             # Get VK token
             token = get_vk_token(app)
 
-            # Extract post info from link
+            # Extract post info from link (or take it stored at ingest)
             link = post.link
-            owner_id, item_id, post_type = extract_post_ids(link)
-
-            # Get post info for timestamp
-            if post_type == 'wall':
-                # Получаем информацию о посте для получения timestamp
-                post_info = make_vk_api_request('wall.getById', {
-                    'posts': f"{owner_id}_{item_id}",
-                    'extended': 1
-                }, token)
-
-                if post_info.get('response') and post_info['response'].get('items'):
-                    vk_post = post_info['response']['items'][0]
-                    # Извлекаем время публикации из ответа API
-                    if vk_post.get('date'):
-                        # Получаем время публикации из API в московском времени
-                        from config import UTC_TZ, MOSCOW_TZ
-
-                        # Создаем UTC время с временной зоной
-                        utc_time = datetime.fromtimestamp(vk_post.get('date'), UTC_TZ)
-
-                        # Конвертируем в московское время
-                        moscow_time = utc_time.astimezone(MOSCOW_TZ)
-
-                        # Убираем информацию о часовом поясе для хранения в БД
-                        publish_time = moscow_time.replace(tzinfo=None)
-
-                        logger.info(f"Получено время публикации из API (МСК): {publish_time}")
-
-                        # Обновляем время публикации в БД (в московском времени без tzinfo)
-                        if publish_time and publish_time != post.publish_time:
-                            post.publish_time = publish_time
-                            logger.info(f"Обновлено время публикации для поста {post_id} на {publish_time} (МСК)")
-
-            # Parse based on post type
-            if post_type == 'wall':
-                parse_result = parse_wall_post(owner_id, item_id, token)
-            elif post_type == 'market':
-                parse_result = parse_market_post(owner_id, item_id, token)
-            elif post_type == 'adblogger':
-                parse_result = parse_adblogger_post(link, token)
+            if post.post_type:
+                owner_id, item_id, post_type = post.owner_id, post.item_id, post.post_type
             else:
-                raise VKAPIError(f"Unknown post type: {post_type}")
+                owner_id, item_id, post_type = extract_post_ids(link)
+
+            # Режим парсинга: полный (с именами) или быстрый (только id)
+            from config import PARSE_MODE_FAST, VK_POST_META_MAX_AGE, get_now_moscow
+            parse_mode = get_parse_mode(post.file)
+            resolve_names = parse_mode != PARSE_MODE_FAST
+
+            # Сбор ответов в ветках комментариев
+            threads_setting = Settings.query.filter_by(key='comment_threads').first()
+            collect_threads = not threads_setting or threads_setting.value == 'on'
+
+            with collect_parse_metrics(parse_mode) as metrics:
+                vk_post = None
+                if post_type == 'wall':
+                    now = get_now_moscow().replace(tzinfo=None)
+                    if post.meta_fetched_at and now - post.meta_fetched_at < VK_POST_META_MAX_AGE:
+                        # Метаданные только что получены при загрузке файла
+                        vk_post = stored_post_metadata(post)
+                    else:
+                        # Единственный свежий запрос метаданных за время парсинга
+                        post_info = make_vk_api_request('wall.getById', {
+                            'posts': f"{owner_id}_{item_id}",
+                            'extended': 1
+                        }, token, use_cache=False)
+
+                        items = wall_post_items(post_info)
+                        if not items:
+                            raise VKAPIError("Post not found")
+
+                        vk_post = items[0]
+                        apply_post_metadata(post, vk_post)
+
+                # Parse based on post type
+                if post_type == 'wall':
+                    parse_result = parse_wall_post(owner_id, item_id, token, resolve_names, collect_threads, vk_post)
+                elif post_type == 'market':
+                    parse_result = parse_market_post(owner_id, item_id, token, resolve_names)
+                elif post_type == 'adblogger':
+                    parse_result = parse_adblogger_post(link, token)
+                else:
+                    raise VKAPIError(f"Unknown post type: {post_type}")
+
+            logger.info(
+                f"Метрики парсинга поста {post_id} ({parse_mode}): "
+                f"{metrics.api_calls} запросов, {metrics.cache_hits} из кэша, "
+                f"{metrics.bytes_received} байт, декодирование JSON "
+                f"{metrics.decode_time * 1000:.1f} мс, всего {metrics.elapsed * 1000:.1f} мс"
+            )
 
             # Create result record
             result = ParseResult(
@@ -521,9 +898,7 @@ def parse_vk_post(post_id, app):
                 likes_count=parse_result['likes']['count'],
                 comments_count=parse_result['comments']['count'],
                 reposts_count=parse_result['reposts']['count'],
-                likes_data=json.dumps(parse_result['likes']['data']),
-                comments_data=json.dumps(parse_result['comments']['data']),
-                reposts_data=json.dumps(parse_result['reposts']['data'])
+                metrics_data=json.dumps(metrics.as_dict())
             )
 
             try:
@@ -535,6 +910,11 @@ def parse_vk_post(post_id, app):
                     # Получаем ID результата до коммита
                     result_id = result.id
 
+                    # Списки активности хранятся построчно, чтобы читать их срезами
+                    store_activity(db, result_id, {
+                        kind: parse_result[kind]['data'] for kind in ACTIVITY_KINDS
+                    })
+
                     db.session.commit()
 
                     # Проверяем существование результата после коммита
@@ -7,11 +7,13 @@ import sys
 # Добавляем путь к проекту в системные пути
 sys.path.insert(0, os.path.dirname(__file__))
 
-# Импортируем Flask-приложение
-from app import app as application
+# Импортируем Flask-приложение (кроме процессов извлечения PDF/ZIP, которые
+# при запуске `python wsgi.py` заново выполняют этот файл как __mp_main__)
+if __name__ != '__mp_main__':
+    from app import app as application
 
 # Настройка логирования
-if __name__ != '__main__':
+if __name__ not in ('__main__', '__mp_main__'):
     import logging
     gunicorn_logger = logging.getLogger('gunicorn.error')
     application.logger.handlers = gunicorn_logger.handlers